@@ -2,27 +2,173 @@
 Utilidades para autenticación JWT
 """
 from datetime import datetime, timedelta
-from typing import Optional, Union
+from typing import Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
+import asyncio
 import os
+import secrets
+import time
+import uuid
+
+from metrics import registry
 
 # Configuración
 SECRET_KEY = os.getenv("SECRET_KEY", "fallback_secret_key_change_in_production")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+
+ACCESS_TOKEN_TYPE = "access"
+REFRESH_TOKEN_TYPE = "refresh"
+
+# Pool dedicado para bcrypt: cada hash tarda decenas de ms y no debe bloquear el event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+PASSWORD_HASH_MAX_WAIT_SECONDS = float(os.getenv("PASSWORD_HASH_MAX_WAIT_SECONDS", "2.0"))
+
+# Esquema y coste del hash (calibrar con calibrate_password_hash.py en el hardware de producción)
+PASSWORD_HASH_SCHEME = os.getenv("PASSWORD_HASH_SCHEME", "bcrypt")  # bcrypt | argon2
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "2"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "19456"))  # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "1"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+PASSWORD_HASH_SCHEMES = ("bcrypt", "argon2")
+
+def build_password_context(
+    scheme: str = PASSWORD_HASH_SCHEME,
+    bcrypt_rounds: int = BCRYPT_ROUNDS,
+    argon2_time_cost: int = ARGON2_TIME_COST,
+    argon2_memory_cost: int = ARGON2_MEMORY_COST,
+    argon2_parallelism: int = ARGON2_PARALLELISM
+) -> CryptContext:
+    """Contexto con `scheme` por defecto; el resto de esquemas (y otros costes) quedan obsoletos
+
+    Los hashes obsoletos se siguen verificando y se rehacen al hacer login (verify_and_update).
+    """
+    if scheme not in PASSWORD_HASH_SCHEMES:
+        raise ValueError(f"PASSWORD_HASH_SCHEME debe ser uno de {PASSWORD_HASH_SCHEMES}")
+    return CryptContext(
+        schemes=[scheme] + [other for other in PASSWORD_HASH_SCHEMES if other != scheme],
+        default=scheme,
+        deprecated="auto",
+        bcrypt__rounds=bcrypt_rounds,
+        argon2__type="ID",
+        argon2__time_cost=argon2_time_cost,
+        argon2__memory_cost=argon2_memory_cost,
+        argon2__parallelism=argon2_parallelism,
+    )
+
+pwd_context = build_password_context()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verificar contraseña"""
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verificar contraseña y, si el hash usa otro esquema o coste, devolver el hash nuevo"""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
 def get_password_hash(password: str) -> str:
     """Obtener hash de contraseña"""
     return pwd_context.hash(password)
 
+class PasswordHashPool:
+    """Ejecuta hash/verify en un pool de hilos acotado, con cola limitada y espera máxima"""
+
+    def __init__(self, workers: int, max_queue: int, max_wait_seconds: float):
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._pending = 0
+        self.queue_depth = registry.gauge("password_hash_queue_depth", "Password hash jobs waiting for a worker")
+        self.in_flight = registry.gauge("password_hash_in_flight", "Password hash jobs running")
+        self.rejected = registry.counter("password_hash_rejected_total", "Password hash jobs rejected", label="reason")
+        self.wait_seconds = registry.summary("password_hash_wait_seconds", "Time spent queued before hashing")
+        self.run_seconds = registry.summary("password_hash_run_seconds", "Time spent hashing or verifying")
+
+    def _busy(self, reason: str) -> HTTPException:
+        self.rejected.inc(label_value=reason)
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication service busy, please retry",
+            headers={"Retry-After": "1"},
+        )
+
+    async def run(self, function, *args):
+        """Ejecutar `function(*args)` en el pool sin bloquear el event loop"""
+        if self._pending >= self.max_queue:
+            raise self._busy("queue_full")
+
+        submitted = time.monotonic()
+
+        def job():
+            waited = time.monotonic() - submitted
+            self.queue_depth.dec()
+            self.wait_seconds.observe(waited)
+            # Si ya esperó demasiado el cliente probablemente abandonó: no gastar CPU
+            if waited > self.max_wait_seconds:
+                return _TIMED_OUT
+            self.in_flight.inc()
+            started = time.monotonic()
+            try:
+                return function(*args)
+            finally:
+                self.run_seconds.observe(time.monotonic() - started)
+                self.in_flight.dec()
+
+        self._pending += 1
+        self.queue_depth.inc()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._executor, job)
+        finally:
+            self._pending -= 1
+
+        if result is _TIMED_OUT:
+            raise self._busy("max_wait")
+        return result
+
+_TIMED_OUT = object()
+
+password_hash_pool = PasswordHashPool(
+    PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE, PASSWORD_HASH_MAX_WAIT_SECONDS
+)
+
+async def verify_password_async(plain_password: str, hashed_password: Optional[str]) -> bool:
+    """Verificar contraseña en el pool de hashing
+
+    Sin hash (usuario inexistente) se verifica contra un hash ficticio: mismo coste y
+    tiempo de respuesta, para no revelar qué usuarios existen.
+    """
+    verified, _ = await verify_and_update_password_async(plain_password, hashed_password)
+    return verified
+
+async def verify_and_update_password_async(
+    plain_password: str,
+    hashed_password: Optional[str]
+) -> Tuple[bool, Optional[str]]:
+    """verify_and_update_password en el pool de hashing (mismo tratamiento sin usuario)"""
+    if hashed_password is None:
+        await password_hash_pool.run(lambda: verify_password(plain_password, _dummy_password_hash()))
+        return False, None
+    return await password_hash_pool.run(verify_and_update_password, plain_password, hashed_password)
+
+@lru_cache(maxsize=1)
+def _dummy_password_hash() -> str:
+    return get_password_hash(secrets.token_urlsafe(16))
+
+async def get_password_hash_async(password: str) -> str:
+    """Obtener hash de contraseña en el pool de hashing"""
+    return await password_hash_pool.run(get_password_hash, password)
+
+def new_jti() -> str:
+    """Identificador único de token (claim `jti`)"""
+    return str(uuid.uuid4())
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Crear token de acceso JWT"""
     to_encode = data.copy()
@@ -31,17 +177,29 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
+    to_encode.setdefault("jti", new_jti())
+    to_encode.setdefault("type", ACCESS_TOKEN_TYPE)
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str, credentials_exception):
-    """Verificar y decodificar token JWT"""
+def create_refresh_token(username: str, jti: str, expires_at: datetime) -> str:
+    """Crear refresh token JWT (su estado vive en la tabla refresh_tokens)"""
+    return jwt.encode(
+        {"sub": username, "jti": jti, "type": REFRESH_TOKEN_TYPE, "exp": expires_at},
+        SECRET_KEY, algorithm=ALGORITHM
+    )
+
+def decode_token(token: str, credentials_exception) -> dict:
+    """Verificar y decodificar token JWT, devolviendo todos sus claims"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        return username
     except JWTError:
-        raise credentials_exception
\ No newline at end of file
+        raise credentials_exception
+    if payload.get("sub") is None:
+        raise credentials_exception
+    return payload
+
+def verify_token(token: str, credentials_exception):
+    """Verificar y decodificar token JWT"""
+    return decode_token(token, credentials_exception)["sub"]
\ No newline at end of file
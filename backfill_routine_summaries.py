@@ -0,0 +1,29 @@
+"""
+Script para recalcular el resumen desnormalizado de todas las rutinas
+
+Necesario una vez tras añadir las columnas de resumen a una base de datos con
+rutinas existentes (o si se modificaron series fuera de la API).
+
+    python backfill_routine_summaries.py
+"""
+from database import SessionLocal, engine
+from routine_summary import summary_update
+
+def backfill_routine_summaries() -> int:
+    """Recalcular el resumen de todas las rutinas; devuelve cuántas se actualizaron"""
+    db = SessionLocal()
+    try:
+        result = db.execute(summary_update(engine.dialect.name))
+        db.commit()
+        return result.rowcount
+    finally:
+        db.close()
+
+def main():
+    """Función principal"""
+    print("📋 Recalculando el resumen de las rutinas...")
+    total = backfill_routine_summaries()
+    print(f"✅ {total} rutinas actualizadas")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Benchmark de throughput: Session síncrona frente a AsyncSession en handlers async
+
+Misma consulta (rutina con propietario y series/ejercicios, las opciones de carga
+de routers/routines.py) servida de dos formas:
+
+- sync: `async def` con la Session síncrona, como antes del engine asíncrono;
+  cada consulta bloquea el event loop.
+- async: AsyncSession (aiosqlite aquí, asyncpg en producción).
+
+SQLite local no tiene red, así que se simula el round trip a la base de datos
+(Neon) con una espera por sentencia en el hilo que la ejecuta: en modo sync es el
+event loop; en modo async, el hilo del driver.
+
+    python benchmarks/bench_async_db.py
+    python benchmarks/bench_async_db.py --rtt-ms 1 10 --requests 600 --concurrency 40
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Espera simulada por sentencia (segundos); se cambia entre rondas
+latency = {"seconds": 0.0}
+
+def _simulate_round_trip(statement: str) -> None:
+    if latency["seconds"]:
+        time.sleep(latency["seconds"])
+
+def install_latency(engine, async_engine) -> None:
+    """Round trip simulado en cada sentencia, en el hilo que la ejecuta"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "connect")
+    def sync_connect(dbapi_connection, connection_record):
+        dbapi_connection.set_trace_callback(_simulate_round_trip)
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def async_connect(dbapi_connection, connection_record):
+        # La conexión de aiosqlite vive en su propio hilo: se configura a través de él
+        dbapi_connection.run_async(lambda connection: connection.set_trace_callback(_simulate_round_trip))
+
+    # Sólo afecta a las conexiones nuevas: cerrar las que abrieron las migraciones
+    engine.dispose()
+
+def seed() -> int:
+    from database import SessionLocal
+    from models import Exercise, Rutina, SerieEjercicio, User
+
+    with SessionLocal() as db:
+        user = User(email="bench@example.com", username="bench", hashed_password="x")
+        exercises = [Exercise(nombre=f"Ejercicio {n}", grupo_muscular="piernas") for n in range(8)]
+        rutina = Rutina(
+            nombre="Pierna", categoria="fuerza", owner=user,
+            series=[SerieEjercicio(ejercicio=exercise, orden=n, series=4) for n, exercise in enumerate(exercises)]
+        )
+        db.add(rutina)
+        db.commit()
+        return rutina.id
+
+def build_app():
+    from fastapi import Depends, FastAPI
+    from sqlalchemy import select
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    from database import SessionLocal, get_async_db
+    from models import Rutina, RutinaResponse
+    from routers.routines import RUTINA_LOAD_OPTIONS
+
+    app = FastAPI()
+
+    @app.get("/sync/{rutina_id}")
+    async def sync_route(rutina_id: int):
+        with SessionLocal() as db:
+            rutina = db.scalars(select(Rutina).options(*RUTINA_LOAD_OPTIONS).where(Rutina.id == rutina_id)).one()
+            return RutinaResponse.model_validate(rutina)
+
+    @app.get("/async/{rutina_id}")
+    async def async_route(rutina_id: int, db: AsyncSession = Depends(get_async_db)):
+        rutina = (await db.scalars(select(Rutina).options(*RUTINA_LOAD_OPTIONS).where(Rutina.id == rutina_id))).one()
+        return RutinaResponse.model_validate(rutina)
+
+    return app
+
+async def load(app, path: str, requests: int, concurrency: int) -> float:
+    """Peticiones por segundo con `concurrency` clientes a la vez"""
+    import httpx
+    from database import async_engine
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get(path)  # Calentamiento (pool de conexiones)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with semaphore:
+                response = await client.get(path)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    # Cada ronda corre en su propio event loop: no reutilizar conexiones del anterior
+    await async_engine.dispose()
+    return requests / elapsed
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Throughput de Session síncrona frente a AsyncSession")
+    parser.add_argument("--rtt-ms", type=float, nargs="+", default=[0, 2, 5, 20])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_async.db"
+    from database import async_engine, engine
+    from migrate import upgrade_database
+
+    upgrade_database()
+    rutina_id = seed()
+    install_latency(engine, async_engine)
+    app = build_app()
+
+    print(f"⚡ {args.requests} peticiones, {args.concurrency} concurrentes, CPUs={os.cpu_count()}")
+    print(f"{'rtt ms':>7} {'sync req/s':>11} {'async req/s':>12} {'async/sync':>11}")
+    for rtt in args.rtt_ms:
+        latency["seconds"] = rtt / 1000
+        sync_rps = asyncio.run(load(app, f"/sync/{rutina_id}", args.requests, args.concurrency))
+        async_rps = asyncio.run(load(app, f"/async/{rutina_id}", args.requests, args.concurrency))
+        print(f"{rtt:>7g} {sync_rps:>11.1f} {async_rps:>12.1f} {async_rps / sync_rps:>10.2f}x")
+
+if __name__ == "__main__":
+    main()
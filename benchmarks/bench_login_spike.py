@@ -0,0 +1,144 @@
+"""
+Benchmark de latencia de la API durante un pico de logins
+
+Mientras se lanzan muchos logins concurrentes (bcrypt), una sonda pide /health
+sin parar y mide su latencia: si el hash corre en el event loop, cada verificación
+congela todas las peticiones. Se compara:
+
+- inline: bcrypt en el event loop (como antes del pool de hashing)
+- pool: bcrypt en auth.password_hash_pool (como ahora)
+
+    python benchmarks/bench_login_spike.py
+    python benchmarks/bench_login_spike.py --logins 200 --concurrency 50 --bcrypt-rounds 12
+
+Usa una base de datos SQLite temporal y la app en proceso (httpx + ASGI).
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+PASSWORD = "secreto123"
+PROBE_INTERVAL = 0.01  # segundos entre peticiones de la sonda
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def summary(values) -> str:
+    if not values:
+        return "sin datos"
+    return (
+        f"p50 {statistics.median(values):7.1f} ms   p99 {percentile(values, 0.99):7.1f} ms   "
+        f"max {max(values):7.1f} ms   (n={len(values)})"
+    )
+
+def seed_users(total: int) -> None:
+    from sqlalchemy import insert
+    from auth import get_password_hash
+    from database import SessionLocal
+    from models import User
+
+    hashed = get_password_hash(PASSWORD)
+    with SessionLocal() as db:
+        db.execute(insert(User), [
+            {"email": f"user{n}@example.com", "username": f"user{n}", "hashed_password": hashed, "is_active": True}
+            for n in range(total)
+        ])
+        db.commit()
+
+async def spike(app, logins: int, concurrency: int, idle_seconds: float):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        idle, during, login_latencies, statuses = [], [], [], Counter()
+        samples = idle
+        stop = asyncio.Event()
+
+        async def probe():
+            # Una petición cada PROBE_INTERVAL; la latencia se cuenta desde el instante en
+            # que tocaba enviarla, así un event loop bloqueado no esconde la espera
+            due = time.perf_counter()
+            while not stop.is_set():
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await client.get("/health")
+                samples.append((time.perf_counter() - due) * 1000)
+                due += PROBE_INTERVAL
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def login(n: int):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(
+                    "/api/v1/auth/login", data={"username": f"user{n}", "password": PASSWORD}
+                )
+                login_latencies.append((time.perf_counter() - started) * 1000)
+                statuses[response.status_code] += 1
+
+        probe_task = asyncio.create_task(probe())
+        await asyncio.sleep(idle_seconds)
+        samples = during
+        started = time.perf_counter()
+        await asyncio.gather(*(login(n) for n in range(logins)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe_task
+        return idle, during, login_latencies, statuses, elapsed
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Latencia de la API durante un pico de logins")
+    parser.add_argument("--logins", type=int, default=120)
+    parser.add_argument("--concurrency", type=int, default=40)
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--idle-seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    # Los logins escriben a la vez (refresh tokens): SQLite espera el bloqueo en vez de fallar
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_login.db?timeout=120"
+    os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    # Sin límite de intentos: aquí sólo interesa el coste del hash
+    os.environ["LOGIN_IP_CAPACITY"] = "1000000"
+    os.environ["LOGIN_USER_CAPACITY"] = "1000000"
+
+    import auth
+    from migrate import upgrade_database
+
+    upgrade_database()
+    seed_users(args.logins)
+
+    import main as api
+
+    pooled_run = auth.password_hash_pool.run
+
+    async def inline_run(function, *args):
+        # Antes del pool: el hash se ejecutaba directamente en el event loop
+        return function(*args)
+
+    print(
+        f"🔐 {args.logins} logins, {args.concurrency} concurrentes, bcrypt rounds={args.bcrypt_rounds}, "
+        f"workers del pool={auth.PASSWORD_HASH_WORKERS}, CPUs={os.cpu_count()}"
+    )
+    for mode, run in (("inline", inline_run), ("pool", pooled_run)):
+        auth.password_hash_pool.run = run
+        idle, during, logins, statuses, elapsed = asyncio.run(
+            spike(api.app, args.logins, args.concurrency, args.idle_seconds)
+        )
+        print(f"\n[{mode}] pico de {elapsed:.1f}s, respuestas {dict(statuses)}")
+        print(f"  /health en reposo   {summary(idle)}")
+        print(f"  /health en el pico  {summary(during)}")
+        print(f"  login               {summary(logins)}")
+
+if __name__ == "__main__":
+    main()
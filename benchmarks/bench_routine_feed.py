@@ -0,0 +1,173 @@
+"""
+Benchmark del listado "mis rutinas o públicas" con 1M de rutinas
+
+Siembra una base de datos nueva (SQLite temporal por defecto) y compara la
+consulta de GET /routines de antes (un OR en el WHERE, pagination.paginate_query)
+con la actual (UNION de dos ramas con índice, pagination.paginate_union):
+primera página, página siguiente por cursor y primera página con filtros.
+Al final muestra el plan de las consultas ejecutadas (EXPLAIN) para comprobar
+qué índices usa cada rama.
+
+    python benchmarks/bench_routine_feed.py
+    python benchmarks/bench_routine_feed.py --rows 1000000 --database-url postgresql://.../bench
+
+¡La base de datos indicada se modifica! Usar una vacía, nunca la de producción.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+USERS = 5000
+PUBLIC_FRACTION = 0.1
+ME = 1  # Usuario que pide el listado (≈ rows / USERS rutinas propias)
+CATEGORIAS = ["fuerza", "hipertrofia", "resistencia", "definicion", "funcional"]
+NIVELES = ["principiante", "intermedio", "avanzado"]
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def seed(rows: int) -> None:
+    from sqlalchemy import insert
+    from database import engine
+    from models import Rutina, User
+    from search import drop_search_indexes
+
+    rng = random.Random(22)
+    start = datetime(2024, 1, 1)
+    with engine.begin() as connection:
+        # El benchmark no busca por texto: sin los triggers FTS la siembra es mucho más rápida
+        drop_search_indexes(connection)
+        connection.execute(insert(User), [
+            {"email": f"user{n}@example.com", "username": f"user{n}", "hashed_password": "x"}
+            for n in range(1, USERS + 1)
+        ])
+        for offset in range(0, rows, 20000):
+            connection.execute(insert(Rutina), [
+                {
+                    "nombre": f"Rutina {n}",
+                    "categoria": rng.choice(CATEGORIAS),
+                    "nivel_dificultad": rng.choice(NIVELES),
+                    "is_public": rng.random() < PUBLIC_FRACTION,
+                    "is_template": False,
+                    "owner_id": rng.randint(1, USERS),
+                    # Fechas desordenadas respecto al id
+                    "created_at": start + timedelta(seconds=rng.randrange(2 * 365 * 24 * 3600)),
+                }
+                for n in range(offset, min(rows, offset + 20000))
+            ])
+        if connection.dialect.name == "postgresql":
+            connection.exec_driver_sql("ANALYZE rutinas")
+        else:
+            connection.exec_driver_sql("ANALYZE")
+
+async def feed(strategy: str, cursor=None, **filters):
+    """Una página del listado con la estrategia indicada; devuelve (filas, cursor siguiente)"""
+    from fastapi import Response
+    from sqlalchemy import or_, select
+    from database import AsyncSessionLocal
+    from models import Rutina
+    from pagination import NEXT_CURSOR_HEADER, paginate_query, paginate_union
+
+    query = select(Rutina)
+    for column, value in filters.items():
+        query = query.where(getattr(Rutina, column) == value)
+    branches = [Rutina.owner_id == ME, Rutina.is_public == True]
+    columns = [Rutina.created_at, Rutina.id]
+    response = Response()
+    async with AsyncSessionLocal() as db:
+        if strategy == "or":
+            rows = await paginate_query(
+                db, query.where(or_(*branches)), columns, response, cursor=cursor, limit=20, descending=True
+            )
+        else:
+            rows = await paginate_union(
+                db, query, branches, columns, response, cursor=cursor, limit=20, descending=True
+            )
+    return [row.id for row in rows], response.headers.get(NEXT_CURSOR_HEADER)
+
+async def benchmark(repetitions: int):
+    _, cursor = await feed("union")
+    scenarios = {
+        "primera página": {},
+        "página 2 (cursor)": {"cursor": cursor},
+        "con filtros": {"categoria": "fuerza", "nivel_dificultad": "avanzado"},
+    }
+    results = []
+    for name, arguments in scenarios.items():
+        expected = None
+        for strategy in ("or", "union"):
+            latencies = []
+            for _ in range(repetitions + 2):
+                started = time.perf_counter()
+                ids, _ = await feed(strategy, **arguments)
+                latencies.append((time.perf_counter() - started) * 1000)
+            latencies = latencies[2:]  # Sin las dos de calentamiento
+            # Las dos estrategias deben devolver la misma página
+            assert expected is None or ids == expected, (name, ids, expected)
+            expected = ids
+            results.append((name, strategy, statistics.median(latencies), percentile(latencies, 0.95)))
+    return scenarios, results
+
+def explain(scenarios) -> None:
+    """Plan de cada sentencia que ejecuta el listado (capturadas al vuelo)"""
+    from sqlalchemy import event
+    from database import async_engine, engine
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    for strategy in ("or", "union"):
+        for name, arguments in scenarios.items():
+            if name == "página 2 (cursor)":
+                continue
+            captured.clear()
+            event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+            asyncio.run(feed(strategy, **arguments))
+            event.remove(async_engine.sync_engine, "before_cursor_execute", capture)
+
+            prefix = "EXPLAIN " if engine.dialect.name == "postgresql" else "EXPLAIN QUERY PLAN "
+            print(f"\n--- {strategy} / {name} ---")
+            with engine.connect() as connection:
+                for statement, parameters in captured:
+                    for row in connection.exec_driver_sql(prefix + statement, parameters):
+                        print("  " + str(row[-1]))  # Detalle del plan (SQLite: id, padre, -, detalle)
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Benchmark del listado "mis rutinas o públicas"')
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repetitions", type=int, default=20)
+    parser.add_argument("--database-url", help="Base de datos VACÍA (por defecto, SQLite temporal)")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench_feed.db"
+    from database import engine
+    from migrate import upgrade_database
+
+    upgrade_database()
+    print(f"🌱 Sembrando {args.rows} rutinas de {USERS} usuarios ({engine.dialect.name})...")
+    started = time.perf_counter()
+    seed(args.rows)
+    print(f"   {time.perf_counter() - started:.1f}s")
+
+    scenarios, results = asyncio.run(benchmark(args.repetitions))
+    print(f"\n{'escenario':<20} {'consulta':<8} {'p50 ms':>9} {'p95 ms':>9}")
+    for name, strategy, p50, p95 in results:
+        print(f"{name:<20} {strategy:<8} {p50:>9.2f} {p95:>9.2f}")
+
+    explain(scenarios)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark de la búsqueda de texto completo con 100k ejercicios y 100k rutinas
+
+Siembra una base de datos nueva (SQLite temporal por defecto) y mide la consulta
+de búsqueda de los listados (ids de la primera página, ordenados por relevancia)
+con el índice de búsqueda (search.apply_search) frente al ILIKE '%term%' de antes.
+
+    python benchmarks/bench_search.py
+    python benchmarks/bench_search.py --rows 100000 --database-url postgresql://.../bench
+
+¡La base de datos indicada se modifica! Usar una vacía, nunca la de producción.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+MOVIMIENTOS = [
+    "Elevación", "Press", "Sentadilla", "Remo", "Curl", "Extensión", "Dominada", "Zancada",
+    "Peso muerto", "Aperturas", "Fondos", "Jalón", "Patada", "Encogimiento", "Rotación",
+]
+VARIANTES = [
+    "de piernas", "de banca", "búlgara", "con barra", "con mancuernas", "en polea", "inclinado",
+    "declinado", "frontal", "lateral", "supina", "prona", "a una mano", "en máquina", "colgado",
+]
+EQUIPOS = ["barra", "mancuernas", "polea", "máquina", "banco", "peso corporal", "kettlebell", "bandas"]
+GRUPOS = ["abs", "biceps", "espalda", "gemelos", "hombros", "pectorales", "piernas", "triceps"]
+DESCRIPCIONES = [
+    "Ejercicio básico para ganar fuerza y estabilidad",
+    "Movimiento controlado, sin impulso, con la espalda recta",
+    "Trabajo de resistencia muscular con pausas cortas",
+    "Variante avanzada que exige técnica y coordinación",
+]
+
+# Términos habituales (muchos resultados) y poco frecuentes; sin acentos a propósito
+TERMS = ["elevacion", "press banca", "remo", "sentadilla bulgara", "curl martillo", "jalon polea", "kettlebell", "zancada lateral"]
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def seed(rows: int) -> None:
+    from sqlalchemy import insert
+    from database import SessionLocal
+    from models import Exercise, Rutina, User
+
+    rng = random.Random(42)
+    with SessionLocal() as db:
+        owner_id = db.scalar(insert(User).values(
+            email="bench@example.com", username="bench", hashed_password="x"
+        ).returning(User.id))
+        for start in range(0, rows, 5000):
+            chunk = range(start, min(rows, start + 5000))
+            db.execute(insert(Exercise), [
+                {
+                    "nombre": f"{rng.choice(MOVIMIENTOS)} {rng.choice(VARIANTES)} {n}",
+                    "grupo_muscular": rng.choice(GRUPOS),
+                    "descripcion": rng.choice(DESCRIPCIONES),
+                    "equipo_necesario": rng.choice(EQUIPOS),
+                    "nivel_dificultad": "intermedio",
+                    "is_active": True,
+                }
+                for n in chunk
+            ])
+            db.execute(insert(Rutina), [
+                {
+                    "nombre": f"Rutina {rng.choice(MOVIMIENTOS)} {rng.choice(VARIANTES)} {n}",
+                    "descripcion": rng.choice(DESCRIPCIONES),
+                    "categoria": "fuerza",
+                    "nivel_dificultad": "intermedio",
+                    "is_public": True,
+                    "is_template": False,
+                    "owner_id": owner_id,
+                }
+                for n in chunk
+            ])
+        db.commit()
+
+def measure(model, condition, dialect: str, repetitions: int, limit: int = 20):
+    """Latencias (ms) de la primera página de cada término, y resultados por término"""
+    from sqlalchemy import select
+    from database import SessionLocal
+    from search import apply_search
+
+    latencies, hits = [], {}
+    with SessionLocal() as db:
+        for term in TERMS:
+            query = apply_search(select(model.id).where(condition), model, term, dialect).limit(limit)
+            for _ in range(3):  # Calentamiento (caché de páginas)
+                db.execute(query).all()
+            for _ in range(repetitions):
+                started = time.perf_counter()
+                hits[term] = len(db.execute(query).all())
+                latencies.append((time.perf_counter() - started) * 1000)
+    return latencies, hits
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Benchmark de búsqueda de texto completo")
+    parser.add_argument("--rows", type=int, default=100_000, help="Ejercicios y rutinas a sembrar (de cada)")
+    parser.add_argument("--repetitions", type=int, default=30, help="Consultas por término")
+    parser.add_argument("--database-url", help="Base de datos VACÍA (por defecto, SQLite temporal)")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench_search.db"
+    from database import engine
+    from migrate import upgrade_database
+    from models import Exercise, Rutina
+
+    upgrade_database()
+    print(f"🌱 Sembrando {args.rows} ejercicios y {args.rows} rutinas ({engine.dialect.name})...")
+    started = time.perf_counter()
+    seed(args.rows)
+    print(f"   {time.perf_counter() - started:.1f}s")
+
+    print(f"\n{'tabla':<10} {'modo':<8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}  resultados por término (límite 20)")
+    # Mismo filtro que los listados: ejercicios activos, rutinas públicas
+    for model, condition in ((Exercise, Exercise.is_active == True), (Rutina, Rutina.is_public == True)):
+        # Cualquier motor que no sea postgresql/sqlite cae en el ILIKE de antes
+        for mode, dialect in (("indice", engine.dialect.name), ("ilike", "ilike")):
+            latencies, hits = measure(model, condition, dialect, args.repetitions)
+            print(
+                f"{model.__tablename__:<10} {mode:<8} {statistics.median(latencies):>8.2f} "
+                f"{percentile(latencies, 0.95):>8.2f} {max(latencies):>8.2f}  "
+                + " ".join(f"{term}={count}" for term, count in hits.items())
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Script para generar variantes WebP (y opcionalmente AVIF) de las imágenes de ejercicios
+
+Las variantes se guardan junto a cada original (`press-banca.w320.webp`) y se
+registran en images/manifest.json, que la API usa para exponer URLs por tamaño.
+El manifiesto incluye el hash de contenido de cada fichero (ETag y `?v=` de las
+URLs inmutables) y un placeholder LQIP por imagen, que con `--db` se guarda
+también en los ejercicios. Sólo se regeneran las variantes más antiguas que su original.
+"""
+import argparse
+import base64
+import hashlib
+import io
+import json
+import re
+from pathlib import Path
+
+from images import IMAGES_DIR, IMAGES_URL_PREFIX, MANIFEST_PATH
+
+try:
+    from PIL import Image
+except ImportError:  # Sólo hace falta en el paso de build, no en la API
+    Image = None
+
+DEFAULT_WIDTHS = [160, 320, 640]
+PLACEHOLDER_WIDTH = 16
+ORIGINAL_SUFFIXES = {".png", ".jpg", ".jpeg"}
+VARIANT_STEM = re.compile(r"\.w\d+$")
+
+def avif_available() -> bool:
+    """AVIF requiere Pillow con libavif (o el plugin pillow-avif-plugin)"""
+    try:
+        import pillow_avif  # noqa: F401
+    except ImportError:
+        pass
+    return ".avif" in Image.registered_extensions()
+
+def iter_originals(images_dir: Path):
+    """Imágenes originales (se ignoran las variantes ya generadas)"""
+    for path in sorted(images_dir.rglob("*")):
+        if path.suffix.lower() in ORIGINAL_SUFFIXES and not VARIANT_STEM.search(path.stem):
+            yield path
+
+def file_hash(path: Path) -> str:
+    """Hash corto del contenido del fichero"""
+    return hashlib.sha256(path.read_bytes()).hexdigest()[:16]
+
+def make_placeholder(image) -> str:
+    """LQIP: miniatura WebP de PLACEHOLDER_WIDTH px como data URI (unos cientos de bytes)"""
+    height = max(1, round(image.height * PLACEHOLDER_WIDTH / image.width))
+    tiny = image.resize((PLACEHOLDER_WIDTH, height), Image.BILINEAR)
+    buffer = io.BytesIO()
+    tiny.save(buffer, format="WEBP", quality=30)
+    return "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+def build_variant(image, original: Path, target: Path, width: int, image_format: str, quality: int) -> None:
+    """Redimensionar y guardar una variante si no existe o está desactualizada"""
+    if target.exists() and target.stat().st_mtime >= original.stat().st_mtime:
+        return
+    height = round(image.height * width / image.width)
+    resized = image.resize((width, height), Image.LANCZOS) if width < image.width else image
+    options = {"quality": quality}
+    if image_format == "webp":
+        options["method"] = 6  # Compresión más lenta pero más pequeña: se hace una sola vez
+    resized.save(target, format=image_format.upper(), **options)
+
+def build_images(images_dir: Path, widths, formats, quality: int) -> dict:
+    """Generar todas las variantes y devolver el manifiesto"""
+    manifest = {"widths": sorted(widths), "formats": formats, "images": {}, "files": {}}
+
+    for original in iter_originals(images_dir):
+        relative = original.relative_to(images_dir).as_posix()
+        with Image.open(original) as source:
+            image = source.convert("RGBA") if source.mode in ("P", "LA") else source.copy()
+
+        entry = {
+            "width": image.width,
+            "height": image.height,
+            "placeholder": make_placeholder(image),
+            "variants": {},
+        }
+        for image_format in formats:
+            variants = {}
+            for width in sorted(set(min(w, image.width) for w in widths)):
+                target = original.with_name(f"{original.stem}.w{width}.{image_format}")
+                build_variant(image, original, target, width, image_format, quality)
+                variant = target.relative_to(images_dir).as_posix()
+                variants[str(width)] = variant
+                manifest["files"][variant] = file_hash(target)
+            entry["variants"][image_format] = variants
+
+        # La versión cambia si cambia el original o cualquiera de sus variantes
+        manifest["files"][relative] = file_hash(original)
+        hashes = [manifest["files"][relative]] + sorted(
+            manifest["files"][variant]
+            for variants in entry["variants"].values() for variant in variants.values()
+        )
+        entry["version"] = hashlib.sha256("".join(hashes).encode()).hexdigest()[:16]
+        manifest["images"][relative] = entry
+        print(f"  ✅ {relative} ({image.width}x{image.height})")
+
+    return manifest
+
+def store_placeholders(manifest: dict) -> int:
+    """Guardar dimensiones y placeholder en los ejercicios que usan cada imagen"""
+    from database import SessionLocal
+    from models import Exercise
+    from catalog import next_change_seq
+    from sqlalchemy import or_
+
+    updated = 0
+    with SessionLocal() as db:
+        for relative, entry in manifest["images"].items():
+            # Una secuencia por imagen (pocas filas cada una: páginas de /changes pequeñas)
+            change_seq = db.scalar(next_change_seq())
+            # Sólo las filas que cambian, para no mover la secuencia de sync sin motivo
+            updated += db.query(Exercise).filter(
+                Exercise.imagen_url == f"{IMAGES_URL_PREFIX}/{relative}",
+                or_(
+                    Exercise.imagen_placeholder.is_(None),
+                    Exercise.imagen_placeholder != entry["placeholder"],
+                    Exercise.imagen_ancho != entry["width"],
+                    Exercise.imagen_alto != entry["height"],
+                )
+            ).update({
+                Exercise.imagen_ancho: entry["width"],
+                Exercise.imagen_alto: entry["height"],
+                Exercise.imagen_placeholder: entry["placeholder"],
+                Exercise.change_seq: change_seq,
+            }, synchronize_session=False)
+        db.commit()
+    return updated
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Generar variantes de imágenes de ejercicios")
+    parser.add_argument("--widths", type=int, nargs="+", default=DEFAULT_WIDTHS)
+    parser.add_argument("--quality", type=int, default=75)
+    parser.add_argument("--avif", action="store_true", help="Generar también variantes AVIF")
+    parser.add_argument("--db", action="store_true", help="Guardar dimensiones y placeholders en los ejercicios")
+    args = parser.parse_args()
+
+    if Image is None:
+        raise SystemExit("❌ Pillow no está instalado: pip install Pillow")
+
+    formats = ["webp"]
+    if args.avif:
+        if avif_available():
+            formats.append("avif")
+        else:
+            print("⚠️  AVIF no disponible en esta instalación de Pillow, se omite")
+
+    print(f"🖼️ Generando variantes {formats} en anchos {args.widths}...")
+    manifest = build_images(IMAGES_DIR, args.widths, formats, args.quality)
+
+    with open(MANIFEST_PATH, "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, ensure_ascii=False, indent=2)
+    print(f"\n🎉 Manifiesto escrito en {MANIFEST_PATH} ({len(manifest['images'])} imágenes)")
+
+    if args.db:
+        updated = store_placeholders(manifest)
+        print(f"🗄️ Placeholders actualizados en {updated} ejercicios")
+
+if __name__ == "__main__":
+    main()
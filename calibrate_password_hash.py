@@ -0,0 +1,74 @@
+"""
+Script para calibrar el coste del hash de contraseñas en el hardware de despliegue
+
+Mide cuánto tarda una verificación con cada coste y propone el mayor que cabe en
+la latencia objetivo. El resultado son variables de entorno para auth.py; los
+hashes existentes se actualizan solos en el siguiente login de cada usuario.
+
+    python calibrate_password_hash.py --scheme argon2 --target-ms 250
+"""
+import argparse
+import statistics
+import time
+
+from auth import ARGON2_MEMORY_COST, ARGON2_PARALLELISM, build_password_context
+
+BCRYPT_ROUNDS_RANGE = range(10, 17)
+ARGON2_TIME_COST_RANGE = range(1, 11)
+
+def measure_verify_ms(context, samples: int) -> float:
+    """Mediana del tiempo de una verificación, en milisegundos"""
+    hashed = context.hash("calibracion-gainz")
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        context.verify("calibracion-gainz", hashed)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+def calibrate(scheme: str, target_ms: float, samples: int, memory_cost: int, parallelism: int):
+    """Probar costes crecientes hasta pasarse del objetivo; devuelve (coste, ms) elegido"""
+    if scheme == "bcrypt":
+        costs = BCRYPT_ROUNDS_RANGE
+        make_context = lambda cost: build_password_context("bcrypt", bcrypt_rounds=cost)
+    else:
+        costs = ARGON2_TIME_COST_RANGE
+        make_context = lambda cost: build_password_context(
+            "argon2", argon2_time_cost=cost,
+            argon2_memory_cost=memory_cost, argon2_parallelism=parallelism
+        )
+
+    chosen = None
+    for cost in costs:
+        elapsed = measure_verify_ms(make_context(cost), samples)
+        print(f"  coste {cost:>2}: {elapsed:7.1f} ms")
+        if elapsed > target_ms:
+            break
+        chosen = (cost, elapsed)
+    # Si ni el mínimo cabe en el objetivo se usa el mínimo
+    return chosen or (costs[0], elapsed)
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Calibrar el coste del hash de contraseñas")
+    parser.add_argument("--scheme", choices=["bcrypt", "argon2"], default="bcrypt")
+    parser.add_argument("--target-ms", type=float, default=250, help="Latencia objetivo de una verificación")
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--memory-cost", type=int, default=ARGON2_MEMORY_COST, help="argon2: memoria en KiB")
+    parser.add_argument("--parallelism", type=int, default=ARGON2_PARALLELISM, help="argon2: hilos por hash")
+    args = parser.parse_args()
+
+    print(f"⏱️ Calibrando {args.scheme} para ~{args.target_ms:.0f} ms por verificación...")
+    cost, elapsed = calibrate(args.scheme, args.target_ms, args.samples, args.memory_cost, args.parallelism)
+
+    print(f"\n🎯 Coste elegido: {cost} ({elapsed:.1f} ms). Variables de entorno:")
+    print(f"PASSWORD_HASH_SCHEME={args.scheme}")
+    if args.scheme == "bcrypt":
+        print(f"BCRYPT_ROUNDS={cost}")
+    else:
+        print(f"ARGON2_TIME_COST={cost}")
+        print(f"ARGON2_MEMORY_COST={args.memory_cost}")
+        print(f"ARGON2_PARALLELISM={args.parallelism}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Catálogo de ejercicios en memoria (versionado, con invalidación write-through)
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import AsyncSessionLocal, SessionLocal
+from models import (
+    ChangeCounter, Exercise, ExerciseResponse, GrupoMuscularEnum, NivelDificultadEnum, CategoriaRutinaEnum
+)
+
+# Recarga periódica para recoger cambios hechos por otros workers
+CATALOG_TTL_SECONDS = int(os.getenv("CATALOG_TTL_SECONDS", "300"))
+
+# Fila de change_counters con la secuencia de Exercise.change_seq
+EXERCISE_CHANGE_COUNTER = "exercises"
+
+def next_change_seq():
+    """UPDATE ... RETURNING que reserva el siguiente valor de la secuencia de cambios
+
+    Ejecutarlo con `db.scalar()` justo antes del commit. El UPDATE bloquea la fila
+    del contador hasta el final de la transacción, así que los escritores se
+    serializan: nunca comparten valor y cada secuencia es visible antes de que se
+    reserve la siguiente (un commit tardío no puede quedar detrás de la versión
+    que ya leyó un cliente en /exercises/changes).
+    """
+    return update(ChangeCounter).where(
+        ChangeCounter.name == EXERCISE_CHANGE_COUNTER
+    ).values(value=ChangeCounter.value + 1).returning(ChangeCounter.value)
+
+class CatalogSnapshot:
+    """Catálogo completo precalculado como JSON (y su versión comprimida con gzip)"""
+
+    def __init__(self, exercises: List[ExerciseResponse], sequence: int):
+        content = {
+            "sequence": sequence,  # Punto de partida para /exercises/changes?since=
+            "exercises": [exercise.model_dump(mode="json") for exercise in exercises],
+            "grupos_musculares": [grupo.value for grupo in GrupoMuscularEnum],
+            "niveles_dificultad": [nivel.value for nivel in NivelDificultadEnum],
+            "categorias": [categoria.value for categoria in CategoriaRutinaEnum],
+        }
+        canonical = json.dumps(content, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        self.version = hashlib.sha256(canonical.encode()).hexdigest()
+
+        self.body = json.dumps(
+            {"version": self.version, **content}, ensure_ascii=False, separators=(",", ":")
+        ).encode()
+        self.gzip_body = gzip.compress(self.body, compresslevel=9, mtime=0)
+
+class ExerciseCatalog:
+    """Repositorio en memoria de los ejercicios activos, indexado por id, grupo y nivel"""
+
+    def __init__(self, ttl_seconds: int = CATALOG_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.version = 0
+        self._fingerprint = ""
+        self._lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+        self._exercises: List[ExerciseResponse] = []
+        self._by_id: Dict[int, ExerciseResponse] = {}
+        self._by_grupo: Dict[str, List[ExerciseResponse]] = {}
+        self._by_nivel: Dict[str, List[ExerciseResponse]] = {}
+        self._etags: Dict[int, str] = {}
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._snapshot_key: Tuple[str, int] = ("", 0)
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _statements():
+        exercises = select(Exercise).where(Exercise.is_active == True).order_by(
+            Exercise.created_at, Exercise.id
+        )
+        sequence = select(func.max(Exercise.change_seq))
+        return exercises, sequence
+
+    def load(self, db: Optional[Session] = None) -> None:
+        """Cargar (o recargar) el catálogo desde la base de datos (síncrono: arranque y scripts)"""
+        if db is None:
+            with SessionLocal() as session:
+                return self.load(session)
+
+        exercises_query, sequence_query = self._statements()
+        self._install(db.scalars(exercises_query).all(), db.scalar(sequence_query) or 0)
+
+    async def refresh(self, db: Optional[AsyncSession] = None) -> None:
+        """Recargar sin bloquear el event loop (p. ej. tras una escritura)"""
+        if db is None:
+            async with AsyncSessionLocal() as session:
+                return await self.refresh(session)
+
+        exercises_query, sequence_query = self._statements()
+        rows = (await db.scalars(exercises_query)).all()
+        self._install(rows, await db.scalar(sequence_query) or 0)
+
+    def _install(self, rows: List[Exercise], sequence: int) -> None:
+        exercises = [ExerciseResponse.model_validate(row) for row in rows]
+        by_grupo: Dict[str, List[ExerciseResponse]] = {}
+        by_nivel: Dict[str, List[ExerciseResponse]] = {}
+        for exercise in exercises:
+            by_grupo.setdefault(exercise.grupo_muscular.value, []).append(exercise)
+            by_nivel.setdefault(exercise.nivel_dificultad.value, []).append(exercise)
+
+        # Huella por ejercicio y del catálogo completo (iguales en todos los workers)
+        etags = {
+            exercise.id: hashlib.sha256(exercise.model_dump_json().encode()).hexdigest()
+            for exercise in exercises
+        }
+        fingerprint = hashlib.sha256(
+            ",".join(f"{exercise_id}:{etag}" for exercise_id, etag in sorted(etags.items())).encode()
+        ).hexdigest()
+
+        # Reemplazo atómico: los lectores ven el catálogo anterior o el nuevo, nunca uno a medias
+        with self._lock:
+            self._exercises = exercises
+            self._by_id = {exercise.id: exercise for exercise in exercises}
+            self._by_grupo = by_grupo
+            self._by_nivel = by_nivel
+            self._etags = etags
+            self._fingerprint = fingerprint
+            if self._snapshot is None or (fingerprint, sequence) != self._snapshot_key:
+                # Sólo se reconstruye (y recomprime) cuando cambian los ejercicios
+                self._snapshot = CatalogSnapshot(exercises, sequence)
+                self._snapshot_key = (fingerprint, sequence)
+            # La versión es la última secuencia de cambios: igual en todos los workers
+            self.version = sequence
+            self._loaded_at = time.monotonic()
+
+    def _ensure_fresh(self) -> None:
+        if self._loaded_at is None:
+            self.load()
+            return
+        if time.monotonic() - self._loaded_at <= self.ttl_seconds:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.load()
+            return
+        # Dentro de la API: se sirve el catálogo actual mientras se recarga en segundo plano
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = loop.create_task(self.refresh())
+
+    def get(self, exercise_id: int) -> Optional[ExerciseResponse]:
+        """Obtener un ejercicio activo por id"""
+        self._ensure_fresh()
+        return self._by_id.get(exercise_id)
+
+    @property
+    def fingerprint(self) -> str:
+        """Huella del contenido de todo el catálogo"""
+        self._ensure_fresh()
+        return self._fingerprint
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        """Catálogo completo listo para enviar"""
+        self._ensure_fresh()
+        return self._snapshot
+
+    def etag_for(self, exercise_id: int) -> Optional[str]:
+        """Huella del contenido de un ejercicio activo"""
+        self._ensure_fresh()
+        return self._etags.get(exercise_id)
+
+    def list(
+        self,
+        grupo_muscular: Optional[str] = None,
+        nivel_dificultad: Optional[str] = None
+    ) -> List[ExerciseResponse]:
+        """Listar ejercicios activos (ordenados por created_at, id) aplicando los filtros"""
+        self._ensure_fresh()
+
+        if grupo_muscular:
+            exercises = self._by_grupo.get(grupo_muscular, [])
+            if nivel_dificultad:
+                exercises = [e for e in exercises if e.nivel_dificultad.value == nivel_dificultad]
+        elif nivel_dificultad:
+            exercises = self._by_nivel.get(nivel_dificultad, [])
+        else:
+            exercises = self._exercises
+
+        return exercises
+
+# Instancia compartida por el proceso
+exercise_catalog = ExerciseCatalog()
@@ -2,6 +2,8 @@
 Configuración de la base de datos y conexiones
 """
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -27,6 +29,51 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Drivers asíncronos para la API (los scripts siguen usando el engine síncrono)
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def get_async_url(url: str):
+    """Misma base de datos con el driver asíncrono (asyncpg / aiosqlite)"""
+    parsed = make_url(url)
+    backend = parsed.drivername.split("+")[0]
+    if backend not in ASYNC_DRIVERS:
+        return parsed
+    parsed = parsed.set(drivername=ASYNC_DRIVERS[backend])
+
+    if backend != "sqlite":
+        # asyncpg no entiende los parámetros de libpq de la URL de Neon
+        query = dict(parsed.query)
+        query.pop("channel_binding", None)
+        if "sslmode" in query:
+            query["ssl"] = query.pop("sslmode")
+        parsed = parsed.set(query=query)
+    return parsed
+
+ASYNC_DATABASE_URL = get_async_url(DATABASE_URL)
+
+# aiosqlite no usa un pool con tamaño (sólo desarrollo local)
+async_pool_options = {} if ASYNC_DATABASE_URL.get_backend_name() == "sqlite" else {
+    "pool_size": 10,
+    "max_overflow": 20,
+}
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    **async_pool_options,
+    pool_pre_ping=True,
+    pool_recycle=300,
+    echo=False
+)
+
+# expire_on_commit=False: tras el commit se siguen leyendo los atributos sin recargarlos
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
 def get_db():
@@ -36,6 +83,10 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 # Función para probar la conexión
 def test_connection():
     try:
@@ -0,0 +1,101 @@
+"""
+Caché HTTP: ETags fuertes, GET condicional (304) y políticas Cache-Control por ruta
+"""
+import hashlib
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import Request, Response, status
+from pydantic import TypeAdapter
+from sqlalchemy import inspect
+
+class CachePolicy:
+    """Cabeceras de caché que acompañan a una ruta (también en los 304)"""
+
+    def __init__(self, cache_control: str, vary: str = "Accept-Encoding"):
+        self.cache_control = cache_control
+        self.vary = vary
+
+    def headers(self, etag: str) -> Dict[str, str]:
+        return {"ETag": etag, "Cache-Control": self.cache_control, "Vary": self.vary}
+
+CACHE_POLICIES = {
+    # Catálogo casi estático: lo puede servir un CDN y revalidar con el ETag
+    "exercise_list": CachePolicy("public, max-age=300, stale-while-revalidate=60"),
+    "exercise_catalog": CachePolicy("public, max-age=300, stale-while-revalidate=60"),
+    "exercise_detail": CachePolicy("public, max-age=3600, stale-while-revalidate=300"),
+    "routine_templates": CachePolicy("public, max-age=600, stale-while-revalidate=60"),
+    # Depende del usuario: sólo la caché del cliente, revalidando siempre
+    "routine_detail": CachePolicy("private, no-cache", "Authorization, Accept-Encoding"),
+}
+
+def compute_etag(*parts: Any) -> str:
+    """ETag fuerte a partir de las partes que determinan el contenido"""
+    digest = hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+def row_version(*rows) -> tuple:
+    """Versión de filas ORM ya cargadas: tabla, clave y valores de sus columnas cargadas"""
+    version = []
+    for row in rows:
+        state = inspect(row)
+        version.append((
+            state.mapper.local_table.name,
+            tuple(
+                getattr(row, attribute.key) for attribute in state.mapper.column_attrs
+                if attribute.key not in state.unloaded
+            )
+        ))
+    return tuple(version)
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Comprobar If-None-Match (comparación débil, como exige RFC 9110 para GET)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    if "*" in candidates:
+        return True
+    return etag in [candidate[2:] if candidate.startswith("W/") else candidate for candidate in candidates]
+
+@lru_cache(maxsize=None)
+def _adapter(annotation) -> TypeAdapter:
+    return TypeAdapter(annotation)
+
+def render_json(annotation, data) -> bytes:
+    """Serializar `data` (ORM o modelos) con el esquema de respuesta a JSON"""
+    adapter = _adapter(annotation)
+    return adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+
+def _endpoint_headers(response: Optional[Response]) -> Dict[str, str]:
+    """Cabeceras que el endpoint fijó en la respuesta inyectada (p. ej. X-Next-Cursor)"""
+    if response is None:
+        return {}
+    return {
+        name: value for name, value in response.headers.items()
+        if name not in ("content-length", "content-type")
+    }
+
+def json_response(annotation, data, response: Optional[Response] = None) -> Response:
+    """Respuesta JSON serializada con `annotation` (conservando las cabeceras del endpoint)"""
+    return Response(
+        content=render_json(annotation, data),
+        media_type="application/json",
+        headers=_endpoint_headers(response)
+    )
+
+def conditional_response(
+    request: Request,
+    etag: str,
+    policy: CachePolicy,
+    render: Callable[[], bytes],
+    response: Optional[Response] = None
+) -> Response:
+    """304 sin serializar nada si el cliente ya tiene la versión; si no, 200 con el cuerpo"""
+    headers = policy.headers(etag)
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    body = render()
+    headers.update(_endpoint_headers(response))
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,255 @@
+"""
+Variantes de imágenes de ejercicios (WebP/AVIF en varios anchos), negociación de
+formato y servido con URLs inmutables por hash de contenido
+"""
+import json
+import mimetypes
+import os
+import stat
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import anyio
+from fastapi import Response, status
+from fastapi.staticfiles import StaticFiles
+from starlette.requests import Request
+from starlette.types import Receive, Scope, Send
+
+IMAGES_DIR = Path(os.getenv("IMAGES_DIR", "images"))
+MANIFEST_PATH = IMAGES_DIR / "manifest.json"
+IMAGES_URL_PREFIX = "/images"
+
+# Caché en memoria para las imágenes pequeñas (miniaturas), que son las más pedidas
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+IMAGE_CACHE_MAX_FILE_BYTES = int(os.getenv("IMAGE_CACHE_MAX_FILE_BYTES", str(64 * 1024)))
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Preferencia de formatos cuando el cliente los acepta
+FORMAT_PREFERENCE = (("avif", "image/avif"), ("webp", "image/webp"))
+
+mimetypes.add_type("image/webp", ".webp")
+mimetypes.add_type("image/avif", ".avif")
+
+class ImageManifest:
+    """Manifiesto generado por build_images.py: dimensiones, variantes y hashes"""
+
+    def __init__(self, path: Path = MANIFEST_PATH):
+        self.path = path
+        self.widths = []
+        self.images: Dict[str, dict] = {}
+        self.files: Dict[str, str] = {}
+        self.reload()
+
+    def reload(self) -> None:
+        """Leer el manifiesto (si todavía no se generó, no hay variantes)"""
+        if not self.path.exists():
+            self.widths, self.images, self.files = [], {}, {}
+            return
+        with open(self.path, encoding="utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+        self.widths = sorted(manifest.get("widths", []))
+        self.images = manifest.get("images", {})
+        self.files = manifest.get("files", {})
+
+    def version(self, path: str) -> Optional[str]:
+        """Versión (hash) de un original y sus variantes"""
+        entry = self.images.get(path)
+        return entry.get("version") if entry else None
+
+    def variant_urls(self, imagen_url: Optional[str]) -> Optional[Dict[str, str]]:
+        """URLs versionadas por ancho para una `imagen_url` (el formato se negocia con Accept)"""
+        if not imagen_url or not imagen_url.startswith(f"{IMAGES_URL_PREFIX}/"):
+            return None
+        entry = self.images.get(imagen_url[len(IMAGES_URL_PREFIX) + 1:])
+        if not entry:
+            return None
+
+        version = entry.get("version")
+        suffix = f"&v={version}" if version else ""
+        urls = {
+            str(width): f"{imagen_url}?w={width}{suffix}"
+            for width in sorted(map(int, entry["variants"].get("webp", {})))
+        }
+        if version:
+            urls["original"] = f"{imagen_url}?v={version}"
+        return urls
+
+    def negotiate(self, path: str, width: Optional[str], accept: str) -> Optional[str]:
+        """Ruta relativa de la mejor variante para el ancho pedido y los formatos aceptados"""
+        entry = self.images.get(path)
+        if not entry or not width or not width.isdigit():
+            return None
+
+        for image_format, mime_type in FORMAT_PREFERENCE:
+            variants = entry["variants"].get(image_format)
+            if not variants or mime_type not in accept:
+                continue
+            # El ancho más pequeño que cubra el pedido (o el mayor disponible)
+            widths = sorted(map(int, variants))
+            chosen = next((w for w in widths if w >= int(width)), widths[-1])
+            return variants[str(chosen)]
+        return None
+
+image_manifest = ImageManifest()
+
+class ImageCache:
+    """LRU en memoria acotado por bytes totales"""
+
+    def __init__(self, max_bytes: int = IMAGE_CACHE_MAX_BYTES, max_file_bytes: int = IMAGE_CACHE_MAX_FILE_BYTES):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.size = 0
+        self._entries: "OrderedDict[tuple, bytes]" = OrderedDict()
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        data = self._entries.get(key)
+        if data is not None:
+            self._entries.move_to_end(key)
+        return data
+
+    def put(self, key: tuple, data: bytes) -> None:
+        if len(data) > self.max_file_bytes or key in self._entries:
+            return
+        self._entries[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+image_cache = ImageCache()
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Rango único `bytes=inicio-fin`; None si no hay rango o no se soporta (varios rangos)"""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_text, _, end_text = header[len("bytes="):].strip().partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+        else:
+            # Sufijo: los últimos N bytes
+            start, end = max(size - int(end_text), 0), size - 1
+    except ValueError:
+        return None
+
+    end = min(end, size - 1)
+    if start > end:
+        raise ValueError("unsatisfiable range")
+    return start, end
+
+class ImageFileResponse(Response):
+    """Respuesta de fichero con soporte de Range, caché en memoria y sendfile (zero-copy)"""
+
+    chunk_size = 64 * 1024
+
+    def __init__(
+        self,
+        path: str,
+        stat_result: os.stat_result,
+        headers: Dict[str, str],
+        byte_range: Optional[Tuple[int, int]] = None,
+        send_body: bool = True
+    ):
+        self.path = path
+        self.file_size = stat_result.st_size
+        self.cache_key = (path, stat_result.st_mtime_ns, self.file_size)
+        self.start, self.end = byte_range or (0, self.file_size - 1)
+        self.send_body = send_body
+        self.status_code = status.HTTP_206_PARTIAL_CONTENT if byte_range else status.HTTP_200_OK
+        self.media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.background = None
+        self.init_headers(headers)
+
+        self.headers["content-length"] = str(self.end - self.start + 1)
+        self.headers["accept-ranges"] = "bytes"
+        if byte_range:
+            self.headers["content-range"] = f"bytes {self.start}-{self.end}/{self.file_size}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if not self.send_body or self.file_size == 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        count = self.end - self.start + 1
+        data = image_cache.get(self.cache_key)
+        if data is None and self.file_size <= image_cache.max_file_bytes:
+            data = await anyio.to_thread.run_sync(Path(self.path).read_bytes)
+            image_cache.put(self.cache_key, data)
+
+        if data is not None:
+            await send({"type": "http.response.body", "body": data[self.start:self.end + 1]})
+            return
+
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            # El servidor copia el fichero directamente al socket (sendfile)
+            with open(self.path, "rb") as image_file:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": image_file,
+                    "offset": self.start,
+                    "count": count,
+                })
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as image_file:
+            await image_file.seek(self.start)
+            remaining = count
+            while remaining > 0:
+                chunk = await image_file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b""})
+
+class ImageFiles(StaticFiles):
+    """StaticFiles con variantes (`?w=`), URLs inmutables (`?v=`), ETags precalculados y Range"""
+
+    async def get_response(self, path: str, scope: Scope):
+        request = Request(scope)
+        if request.method not in ("GET", "HEAD"):
+            return await super().get_response(path, scope)
+
+        width = request.query_params.get("w")
+        served_path = image_manifest.negotiate(path, width, request.headers.get("accept", "")) or path
+        full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, served_path)
+        if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+            # Directorios, 404, etc.: comportamiento estándar de StaticFiles
+            return await super().get_response(path, scope)
+
+        file_hash = image_manifest.files.get(served_path)
+        etag = f'"{file_hash}"' if file_hash else f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+        headers = {"etag": etag}
+
+        version = image_manifest.version(path)
+        if version and request.query_params.get("v") == version:
+            # La URL cambia cuando cambia el contenido: se puede cachear para siempre
+            headers["cache-control"] = IMMUTABLE_CACHE_CONTROL
+        if width:
+            # La misma URL devuelve formatos distintos según Accept
+            headers["vary"] = "Accept"
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag in [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        byte_range = None
+        if_range = request.headers.get("if-range")
+        if if_range is None or if_range == etag:
+            try:
+                byte_range = parse_range(request.headers.get("range"), stat_result.st_size)
+            except ValueError:
+                return Response(
+                    status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                    headers={"content-range": f"bytes */{stat_result.st_size}"}
+                )
+
+        return ImageFileResponse(
+            full_path, stat_result, headers,
+            byte_range=byte_range, send_body=request.method == "GET"
+        )
@@ -2,17 +2,16 @@
 Script de inicialización para producción
 """
 import os
-from database import engine
-from models import Base
+from migrate import upgrade_database
 from populate_all_exercises import populate_all_exercises, create_admin_user
 
 def init_production_db():
     """Inicializar base de datos en producción"""
     print("🚀 Inicializando base de datos de producción...")
     
-    # Crear todas las tablas
-    Base.metadata.create_all(bind=engine)
-    print("✅ Tablas creadas")
+    # Tablas e índices (incluidos los de búsqueda) mediante migraciones
+    upgrade_database()
+    print("✅ Esquema actualizado")
     
     # Solo poblar si no hay ejercicios
     from database import SessionLocal
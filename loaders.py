@@ -0,0 +1,73 @@
+"""
+Opciones de carga (eager loading) derivadas de los esquemas de respuesta
+"""
+from functools import lru_cache
+from typing import Optional, Tuple, Type, get_args, get_origin
+
+from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, load_only, selectinload
+from sqlalchemy.sql.base import ExecutableOption
+
+def _nested_schema(annotation) -> Optional[Type[BaseModel]]:
+    """Extraer el esquema Pydantic anidado de una anotación (List[...], Optional[...])"""
+    if get_origin(annotation) is None:
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            return annotation
+        return None
+
+    for arg in get_args(annotation):
+        schema = _nested_schema(arg)
+        if schema is not None:
+            return schema
+    return None
+
+def _build_options(orm_class, schema: Type[BaseModel], parent=None) -> list:
+    """Recorrer el esquema y construir el árbol de loaders para sus relaciones"""
+    relationships = inspect(orm_class).relationships
+    options = []
+
+    for field_name, field in schema.model_fields.items():
+        relationship = relationships.get(field_name)
+        if relationship is None:
+            continue
+
+        # Colecciones con selectinload (evita multiplicar filas), many-to-one con joinedload
+        strategy = "selectinload" if relationship.uselist else "joinedload"
+        attribute = getattr(orm_class, field_name)
+        if parent is None:
+            loader = (selectinload if relationship.uselist else joinedload)(attribute)
+        else:
+            loader = getattr(parent, strategy)(attribute)
+
+        nested = _nested_schema(field.annotation)
+        children = _build_options(relationship.mapper.class_, nested, loader) if nested else []
+        options.extend(children or [loader])
+
+    return options
+
+@lru_cache(maxsize=None)
+def loader_options(orm_class, schema: Type[BaseModel]) -> Tuple[ExecutableOption, ...]:
+    """Opciones de carga para serializar `orm_class` con `schema` sin lazy loads"""
+    return tuple(_build_options(orm_class, schema))
+
+@lru_cache(maxsize=None)
+def projection_options(orm_class, schema: Type[BaseModel], *always: str) -> Tuple[ExecutableOption, ...]:
+    """Como loader_options, pero cargando sólo las columnas que usa `schema` (y `always`)
+
+    Las propiedades calculadas declaran sus columnas en `__load_dependencies__`; si un
+    campo no es columna, relación ni dependencia conocida, se carga la fila completa.
+    """
+    mapper = inspect(orm_class)
+    dependencies = getattr(orm_class, "__load_dependencies__", {})
+    columns = set(always)
+    for field_name in schema.model_fields:
+        if field_name in mapper.column_attrs:
+            columns.add(field_name)
+        elif field_name in dependencies:
+            columns.update(dependencies[field_name])
+        elif field_name not in mapper.relationships:
+            return loader_options(orm_class, schema)
+
+    attributes = [getattr(orm_class, name) for name in sorted(columns)]
+    return (load_only(*attributes),) + loader_options(orm_class, schema)
@@ -2,6 +2,7 @@
 Aplicación principal FastAPI para Gainz API
 """
 from fastapi import FastAPI, Depends, HTTPException, status, File, UploadFile
+from fastapi.responses import PlainTextResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
@@ -11,16 +12,16 @@ import os
 from dotenv import load_dotenv
 
 # Importar módulos locales
-from database import engine, get_db
-from models import Base
+from database import async_engine
 from routers import auth, users, exercises, routines
+from catalog import exercise_catalog
+from revocation import revocation_list
+from images import ImageFiles
+from metrics import registry
 
 # Cargar variables de entorno
 load_dotenv()
 
-# Crear tablas
-Base.metadata.create_all(bind=engine)
-
 # Inicializar FastAPI
 app = FastAPI(
     title="Gainz API",
@@ -37,10 +38,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Cursor de la siguiente página en los listados
 )
 
-# Montar archivos estáticos para las imágenes
-app.mount("/images", StaticFiles(directory="images"), name="images")
+# Montar archivos estáticos para las imágenes (con variantes WebP/AVIF vía ?w=)
+app.mount("/images", ImageFiles(directory="images"), name="images")
 
 # Incluir routers
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["Authentication"])
@@ -48,6 +50,22 @@ app.include_router(users.router, prefix="/api/v1/users", tags=["Users"])
 app.include_router(exercises.router, prefix="/api/v1/exercises", tags=["Exercises"])
 app.include_router(routines.router, prefix="/api/v1/routines", tags=["Routines"])
 
+@app.on_event("startup")
+async def load_exercise_catalog():
+    """Cargar el catálogo de ejercicios en memoria al arrancar"""
+    await exercise_catalog.refresh()
+
+@app.on_event("startup")
+async def start_revocation_sync():
+    """Cargar los tokens revocados y sincronizarlos periódicamente con el resto de workers"""
+    await revocation_list.start()
+
+@app.on_event("shutdown")
+async def close_database_pool():
+    """Cerrar las conexiones del pool asíncrono"""
+    await revocation_list.stop()
+    await async_engine.dispose()
+
 @app.get("/")
 async def root():
     """Endpoint raíz de la API"""
@@ -63,6 +81,11 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "timestamp": "2025-09-29"}
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Métricas del proceso en formato Prometheus"""
+    return registry.render()
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
     uvicorn.run(
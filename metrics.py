@@ -0,0 +1,107 @@
+"""
+Métricas en memoria del proceso, expuestas en formato de texto de Prometheus
+"""
+import threading
+from typing import Dict, List, Tuple
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+
+    def samples(self) -> List[Tuple[str, float]]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{name} {value:g}" for name, value in self.samples()]
+        return "\n".join(lines)
+
+class Counter(_Metric):
+    """Contador monótono, opcionalmente con una etiqueta"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, label: str = None):
+        super().__init__(name, description)
+        self.label = label
+        self._values: Dict[str, float] = {}
+
+    def inc(self, amount: float = 1, label_value: str = "") -> None:
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def value(self, label_value: str = "") -> float:
+        return self._values.get(label_value, 0)
+
+    def samples(self):
+        if self.label is None:
+            return [(self.name, self._values.get("", 0))]
+        return [
+            (f'{self.name}{{{self.label}="{label_value}"}}', value)
+            for label_value, value in sorted(self._values.items())
+        ]
+
+class Gauge(_Metric):
+    """Valor instantáneo que sube y baja"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str):
+        super().__init__(name, description)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def samples(self):
+        return [(self.name, self.value)]
+
+class Summary(_Metric):
+    """Suma y número de observaciones (p. ej. tiempos en segundos)"""
+
+    kind = "summary"
+
+    def __init__(self, name: str, description: str):
+        super().__init__(name, description)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.sum += value
+
+    def samples(self):
+        return [(f"{self.name}_count", self.count), (f"{self.name}_sum", self.sum)]
+
+class Registry:
+    """Registro de métricas del proceso"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, description: str, label: str = None) -> Counter:
+        return self._register(Counter(name, description, label))
+
+    def gauge(self, name: str, description: str) -> Gauge:
+        return self._register(Gauge(name, description))
+
+    def summary(self, name: str, description: str) -> Summary:
+        return self._register(Summary(name, description))
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+registry = Registry()
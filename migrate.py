@@ -0,0 +1,44 @@
+"""
+Aplicar las migraciones del esquema (Alembic) hasta la última revisión
+
+Las bases de datos creadas antes de usar migraciones (con create_all) se marcan
+primero con la revisión inicial, de modo que sólo se aplica lo que les falta.
+
+    python migrate.py
+"""
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+
+from database import engine
+
+ALEMBIC_INI = Path(__file__).resolve().parent / "alembic.ini"
+BASELINE_REVISION = "0001"
+
+def alembic_config() -> Config:
+    """Configuración de Alembic independiente del directorio de trabajo"""
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "migrations"))
+    # Los scripts que la llaman ya configuran su propia salida
+    config.attributes["configure_logger"] = False
+    return config
+
+def upgrade_database() -> None:
+    """Llevar la base de datos a la última revisión"""
+    config = alembic_config()
+    inspector = inspect(engine)
+    if inspector.has_table("users") and not inspector.has_table("alembic_version"):
+        print(f"🏷️ Base de datos anterior a las migraciones: marcando revisión {BASELINE_REVISION}")
+        command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, "head")
+
+def main():
+    """Función principal"""
+    print("🗄️ Aplicando migraciones...")
+    upgrade_database()
+    print("✅ Esquema actualizado")
+
+if __name__ == "__main__":
+    main()
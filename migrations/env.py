@@ -0,0 +1,52 @@
+"""
+Entorno de Alembic: misma base de datos (DATABASE_URL) y metadatos que la API
+"""
+from logging.config import fileConfig
+
+from alembic import context
+
+from database import engine
+from models import Base
+from search import is_search_object
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Autogenerate ignora los objetos de búsqueda: se crean con SQL propio en 0003"""
+    return not (reflected and compare_to is None and is_search_object(name))
+
+def run_migrations_offline() -> None:
+    """Generar el SQL sin conectarse (alembic upgrade --sql)"""
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online() -> None:
+    """Aplicar las migraciones sobre el engine de la API"""
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+            # SQLite no tiene ALTER completo: las migraciones se aplican por lotes
+            render_as_batch=connection.dialect.name == "sqlite",
+            transaction_per_migration=True,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
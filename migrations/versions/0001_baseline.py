@@ -0,0 +1,106 @@
+"""Esquema inicial (el que creaba Base.metadata.create_all antes de usar migraciones)
+
+Las bases de datos creadas así se marcan con esta revisión sin ejecutarla
+(ver migrate.py) y continúan desde la siguiente.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(), nullable=False),
+    sa.Column('username', sa.String(), nullable=False),
+    sa.Column('hashed_password', sa.String(), nullable=False),
+    sa.Column('full_name', sa.String(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_index('ix_users_id', 'users', ['id'], unique=False)
+    op.create_index('ix_users_username', 'users', ['username'], unique=True)
+
+    op.create_table('exercises',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('nombre', sa.String(), nullable=False),
+    sa.Column('grupo_muscular', sa.String(), nullable=False),
+    sa.Column('descripcion', sa.Text(), nullable=True),
+    sa.Column('instrucciones', sa.Text(), nullable=True),
+    sa.Column('nivel_dificultad', sa.String(), nullable=True),
+    sa.Column('equipo_necesario', sa.String(), nullable=True),
+    sa.Column('imagen_url', sa.String(), nullable=True),
+    sa.Column('musculos_secundarios', sa.String(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_exercises_grupo_muscular', 'exercises', ['grupo_muscular'], unique=False)
+    op.create_index('ix_exercises_id', 'exercises', ['id'], unique=False)
+    op.create_index('ix_exercises_nombre', 'exercises', ['nombre'], unique=False)
+
+    op.create_table('rutinas',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('nombre', sa.String(), nullable=False),
+    sa.Column('descripcion', sa.Text(), nullable=True),
+    sa.Column('categoria', sa.String(), nullable=False),
+    sa.Column('duracion_estimada', sa.Integer(), nullable=True),
+    sa.Column('nivel_dificultad', sa.String(), nullable=True),
+    sa.Column('is_public', sa.Boolean(), nullable=True),
+    sa.Column('is_template', sa.Boolean(), nullable=True),
+    sa.Column('owner_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_rutinas_id', 'rutinas', ['id'], unique=False)
+    op.create_index('ix_rutinas_nombre', 'rutinas', ['nombre'], unique=False)
+
+    op.create_table('user_favorite_exercises',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('exercise_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['exercise_id'], ['exercises.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'exercise_id')
+    )
+
+    op.create_table('series_ejercicios',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rutina_id', sa.Integer(), nullable=False),
+    sa.Column('ejercicio_id', sa.Integer(), nullable=False),
+    sa.Column('orden', sa.Integer(), nullable=False),
+    sa.Column('series', sa.Integer(), nullable=False),
+    sa.Column('repeticiones_min', sa.Integer(), nullable=True),
+    sa.Column('repeticiones_max', sa.Integer(), nullable=True),
+    sa.Column('peso', sa.Float(), nullable=True),
+    sa.Column('tiempo_descanso', sa.Integer(), nullable=True),
+    sa.Column('notas', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['ejercicio_id'], ['exercises.id'], ),
+    sa.ForeignKeyConstraint(['rutina_id'], ['rutinas.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_series_ejercicios_id', 'series_ejercicios', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_table('series_ejercicios')
+    op.drop_table('user_favorite_exercises')
+    op.drop_table('rutinas')
+    op.drop_table('exercises')
+    op.drop_table('users')
@@ -0,0 +1,92 @@
+"""Tablas y columnas añadidas antes de usar migraciones
+
+Imágenes y secuencia de cambios de los ejercicios, resumen de las rutinas y
+tablas de refresh tokens / tokens revocados. Las bases de datos anteriores a
+las migraciones pueden tener ya parte de esto (create_all las creaba al
+arrancar), así que sólo se añade lo que falta.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:01
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NEW_COLUMNS = {
+    'exercises': [
+        sa.Column('imagen_ancho', sa.Integer(), nullable=True),
+        sa.Column('imagen_alto', sa.Integer(), nullable=True),
+        sa.Column('imagen_placeholder', sa.Text(), nullable=True),
+        sa.Column('change_seq', sa.Integer(), server_default='0', nullable=False),
+    ],
+    'rutinas': [
+        sa.Column('total_ejercicios', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('total_series', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('duracion_calculada', sa.Integer(), nullable=True),
+        sa.Column('grupos_musculares_csv', sa.String(), nullable=True),
+    ],
+}
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    added = set()
+    for table_name, columns in NEW_COLUMNS.items():
+        existing = {column['name'] for column in inspector.get_columns(table_name)}
+        for column in columns:
+            if column.name not in existing:
+                op.add_column(table_name, column)
+                added.add((table_name, column.name))
+
+    if not inspector.has_table('refresh_tokens'):
+        op.create_table('refresh_tokens',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('jti', sa.String(length=36), nullable=False),
+        sa.Column('family_id', sa.String(length=36), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('revoked_at', sa.DateTime(), nullable=True),
+        sa.Column('replaced_by', sa.String(length=36), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_refresh_tokens_family_id', 'refresh_tokens', ['family_id'], unique=False)
+        op.create_index('ix_refresh_tokens_id', 'refresh_tokens', ['id'], unique=False)
+        op.create_index('ix_refresh_tokens_jti', 'refresh_tokens', ['jti'], unique=True)
+        op.create_index('ix_refresh_tokens_user_id', 'refresh_tokens', ['user_id'], unique=False)
+
+    if not inspector.has_table('revoked_tokens'):
+        op.create_table('revoked_tokens',
+        sa.Column('jti', sa.String(length=36), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('revoked_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('jti')
+        )
+        op.create_index('ix_revoked_tokens_expires_at', 'revoked_tokens', ['expires_at'], unique=False)
+        op.create_index('ix_revoked_tokens_revoked_at', 'revoked_tokens', ['revoked_at'], unique=False)
+
+    if ('rutinas', 'total_series') in added:
+        # Rutinas existentes: calcular su resumen (lo mismo que backfill_routine_summaries.py)
+        from routine_summary import summary_update
+        op.execute(summary_update(op.get_bind().dialect.name))
+
+
+def downgrade() -> None:
+    op.drop_table('revoked_tokens')
+    op.drop_table('refresh_tokens')
+    for table_name, columns in NEW_COLUMNS.items():
+        with op.batch_alter_table(table_name) as batch_op:
+            for column in reversed(columns):
+                batch_op.drop_column(column.name)
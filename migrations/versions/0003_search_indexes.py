@@ -0,0 +1,64 @@
+"""Índices de búsqueda de texto completo (antes se creaban al arrancar la API)
+
+PostgreSQL: extensiones unaccent/pg_trgm, configuración es_unaccent e índices
+GIN. SQLite: tablas FTS5 con sus triggers. Ver search.py.
+
+Los índices GIN se construyen con CREATE INDEX CONCURRENTLY fuera de la
+transacción (autocommit_block), igual que en 0004: sobre tablas con datos no
+bloquean las escrituras. Las extensiones, la función y la configuración de
+búsqueda siguen siendo transaccionales y se confirman antes.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:02
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from search import POSTGRES_SETUP, drop_search_indexes, ensure_search_indexes, postgres_search_indexes
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _is_postgres() -> bool:
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def _drop_if_invalid(name: str) -> None:
+    invalid = op.get_bind().execute(sa.text(
+        "SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+        "WHERE c.relname = :name AND NOT i.indisvalid"
+    ), {'name': name}).first()
+    if invalid:
+        op.drop_index(name, postgresql_concurrently=True, if_exists=True)
+
+
+def upgrade() -> None:
+    if not _is_postgres():
+        ensure_search_indexes(op.get_bind())
+        return
+
+    for statement in POSTGRES_SETUP:
+        op.execute(sa.text(statement))
+    with op.get_context().autocommit_block():
+        for name, ddl in postgres_search_indexes(concurrently=True).items():
+            _drop_if_invalid(name)
+            op.execute(sa.text(ddl))
+
+
+def downgrade() -> None:
+    if not _is_postgres():
+        drop_search_indexes(op.get_bind())
+        return
+
+    with op.get_context().autocommit_block():
+        for name in postgres_search_indexes():
+            op.drop_index(name, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,82 @@
+"""Índices de las consultas frecuentes, creados sin bloquear escrituras
+
+En PostgreSQL cada índice se construye con CREATE INDEX CONCURRENTLY fuera de
+la transacción de la migración (autocommit_block). Si una construcción
+concurrente falla deja un índice inválido; al repetir la migración se borra y
+se vuelve a crear.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 00:00:03
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Sólo rutinas públicas (ramas públicas del listado de rutinas)
+PUBLIC_ONLY = dict(
+    postgresql_where=sa.text('is_public = true'),
+    sqlite_where=sa.text('is_public = 1'),
+)
+
+# nombre -> (tabla, columnas, opciones)
+INDEXES = {
+    # Catálogo de ejercicios: filtros sobre activos y sync incremental
+    'ix_exercises_active_grupo': ('exercises', ['is_active', 'grupo_muscular'], {}),
+    'ix_exercises_active_nivel': ('exercises', ['is_active', 'nivel_dificultad'], {}),
+    'ix_exercises_change_seq': ('exercises', ['change_seq'], {}),
+    # Listado "mis rutinas o públicas", más recientes primero
+    'ix_rutinas_owner_created': ('rutinas', ['owner_id', 'created_at', 'id'], {}),
+    'ix_rutinas_public_created': ('rutinas', ['created_at', 'id'], PUBLIC_ONLY),
+    'ix_rutinas_public_filtros': ('rutinas', ['categoria', 'nivel_dificultad', 'created_at', 'id'], PUBLIC_ONLY),
+    # Series de una rutina en su orden; claves foráneas sin índice
+    'ix_series_ejercicios_rutina_orden': ('series_ejercicios', ['rutina_id', 'orden'], {}),
+    'ix_series_ejercicios_ejercicio_id': ('series_ejercicios', ['ejercicio_id'], {}),
+    'ix_user_favorite_exercises_exercise_id': ('user_favorite_exercises', ['exercise_id'], {}),
+    # Login y registro por email sin distinguir mayúsculas
+    'ix_users_email_lower': ('users', [sa.text('lower(email)')], {}),
+}
+
+
+def _is_postgres() -> bool:
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def _drop_if_invalid(name: str) -> None:
+    invalid = op.get_bind().execute(sa.text(
+        "SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+        "WHERE c.relname = :name AND NOT i.indisvalid"
+    ), {'name': name}).first()
+    if invalid:
+        op.drop_index(name, postgresql_concurrently=True, if_exists=True)
+
+
+def upgrade() -> None:
+    for name, (table_name, columns, options) in INDEXES.items():
+        if _is_postgres():
+            with op.get_context().autocommit_block():
+                _drop_if_invalid(name)
+                op.create_index(
+                    name, table_name, columns,
+                    postgresql_concurrently=True, if_not_exists=True, **options
+                )
+        else:
+            op.create_index(name, table_name, columns, if_not_exists=True, **options)
+
+
+def downgrade() -> None:
+    for name, (table_name, _, _) in reversed(INDEXES.items()):
+        if _is_postgres():
+            with op.get_context().autocommit_block():
+                op.drop_index(name, table_name=table_name, postgresql_concurrently=True, if_exists=True)
+        else:
+            op.drop_index(name, table_name=table_name, if_exists=True)
@@ -0,0 +1,39 @@
+"""Contador de la secuencia de cambios de los ejercicios
+
+change_seq se calculaba como max(change_seq) + 1 dentro del INSERT/UPDATE, lo
+que permitía valores repetidos entre transacciones concurrentes. Ahora sale de
+una fila de change_counters que se incrementa (y queda bloqueada) en la
+transacción que escribe; se inicializa con el máximo actual.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 00:00:04
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('change_counters',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('value', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.execute(
+        "INSERT INTO change_counters (name, value) "
+        "SELECT 'exercises', COALESCE(MAX(change_seq), 0) FROM exercises"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('change_counters')
@@ -0,0 +1,32 @@
+"""Recalcular total_ejercicios como número de ejercicios distintos
+
+Antes contaba las filas de series_ejercicios, así que una rutina que repite un
+ejercicio mostraba más ejercicios de los que tiene. Se recalcula el resumen de
+todas las rutinas con la nueva definición (ver routine_summary.py).
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 00:00:05
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from routine_summary import summary_update
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(summary_update(op.get_bind().dialect.name))
+
+
+def downgrade() -> None:
+    # Sólo cambian datos derivados; el esquema es el mismo
+    pass
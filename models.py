@@ -1,15 +1,17 @@
 """
 Modelos de base de datos para la API de Rutinas de Gym
 """
-from sqlalchemy import Column, Integer, String, Boolean, Float, Text, DateTime, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, Boolean, Float, Text, DateTime, ForeignKey, Index, Table, true
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
 from datetime import datetime
 from enum import Enum
 
+from images import image_manifest
+
 Base = declarative_base()
 
 # Tabla de relación muchos a muchos para ejercicios favoritos
@@ -17,7 +19,7 @@ user_favorite_exercises = Table(
     'user_favorite_exercises',
     Base.metadata,
     Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
-    Column('exercise_id', Integer, ForeignKey('exercises.id'), primary_key=True)
+    Column('exercise_id', Integer, ForeignKey('exercises.id'), primary_key=True, index=True)
 )
 
 class GrupoMuscularEnum(str, Enum):
@@ -42,6 +44,10 @@ class CategoriaRutinaEnum(str, Enum):
     DEFINICION = "definicion"
     FUNCIONAL = "funcional"
 
+class ListViewEnum(str, Enum):
+    FULL = "full"
+    SUMMARY = "summary"  # Sólo lo que muestra una pantalla de listado
+
 # Modelos SQLAlchemy (Base de datos)
 class User(Base):
     __tablename__ = "users"
@@ -57,6 +63,11 @@ class User(Base):
     # Relaciones
     rutinas = relationship("Rutina", back_populates="owner")
     ejercicios_favoritos = relationship("Exercise", secondary=user_favorite_exercises, back_populates="usuarios_favoritos")
+    
+    # Login y registro buscan el email sin distinguir mayúsculas
+    __table_args__ = (
+        Index("ix_users_email_lower", func.lower(email)),
+    )
 
 class Exercise(Base):
     __tablename__ = "exercises"
@@ -69,13 +80,31 @@ class Exercise(Base):
     nivel_dificultad = Column(String, default="intermedio")  # NivelDificultadEnum
     equipo_necesario = Column(String)
     imagen_url = Column(String)  # Ruta a la imagen
+    imagen_ancho = Column(Integer)  # Dimensiones en píxeles del original
+    imagen_alto = Column(Integer)
+    imagen_placeholder = Column(Text)  # LQIP: data URI WebP diminuta para pintar mientras carga
     musculos_secundarios = Column(String)  # Separados por comas
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0", index=True)  # Secuencia de cambios para sync incremental
     
     # Relaciones
     series = relationship("SerieEjercicio", back_populates="ejercicio")
     usuarios_favoritos = relationship("User", secondary=user_favorite_exercises, back_populates="ejercicios_favoritos")
+    
+    # Filtros del catálogo (sólo ejercicios activos)
+    __table_args__ = (
+        Index("ix_exercises_active_grupo", "is_active", "grupo_muscular"),
+        Index("ix_exercises_active_nivel", "is_active", "nivel_dificultad"),
+    )
+    
+    # Columnas que necesitan las propiedades calculadas (para cargar sólo lo justo en los listados)
+    __load_dependencies__ = {"imagenes": ("imagen_url",)}
+    
+    @property
+    def imagenes(self):
+        """URLs de la imagen por ancho (variantes generadas por build_images.py)"""
+        return image_manifest.variant_urls(self.imagen_url)
 
 class Rutina(Base):
     __tablename__ = "rutinas"
@@ -92,16 +121,42 @@ class Rutina(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    # Resumen desnormalizado de las series (lo mantiene routine_summary.py)
+    total_ejercicios = Column(Integer, nullable=False, default=0, server_default="0")
+    total_series = Column(Integer, nullable=False, default=0, server_default="0")
+    duracion_calculada = Column(Integer)  # en minutos, estimada a partir de las series
+    grupos_musculares_csv = Column(String)  # grupos distintos separados por comas
+    
     # Relaciones
     owner = relationship("User", back_populates="rutinas")
     series = relationship("SerieEjercicio", back_populates="rutina", cascade="all, delete-orphan")
+    
+    # Índices del listado "mis rutinas o públicas" (una rama del UNION cada uno), más recientes primero
+    __table_args__ = (
+        Index("ix_rutinas_owner_created", "owner_id", "created_at", "id"),
+        Index(
+            "ix_rutinas_public_created", "created_at", "id",
+            postgresql_where=is_public == true(), sqlite_where=is_public == true()
+        ),
+        Index(
+            "ix_rutinas_public_filtros", "categoria", "nivel_dificultad", "created_at", "id",
+            postgresql_where=is_public == true(), sqlite_where=is_public == true()
+        ),
+    )
+    
+    __load_dependencies__ = {"grupos_musculares": ("grupos_musculares_csv",)}
+    
+    @property
+    def grupos_musculares(self):
+        """Grupos musculares que trabaja la rutina, en orden alfabético"""
+        return sorted(filter(None, (self.grupos_musculares_csv or "").split(",")))
 
 class SerieEjercicio(Base):
     __tablename__ = "series_ejercicios"
     
     id = Column(Integer, primary_key=True, index=True)
     rutina_id = Column(Integer, ForeignKey("rutinas.id"), nullable=False)
-    ejercicio_id = Column(Integer, ForeignKey("exercises.id"), nullable=False)
+    ejercicio_id = Column(Integer, ForeignKey("exercises.id"), nullable=False, index=True)
     orden = Column(Integer, nullable=False)  # Orden del ejercicio en la rutina
     series = Column(Integer, nullable=False)
     repeticiones_min = Column(Integer)
@@ -113,6 +168,38 @@ class SerieEjercicio(Base):
     # Relaciones
     rutina = relationship("Rutina", back_populates="series")
     ejercicio = relationship("Exercise", back_populates="series")
+    
+    # Series de una rutina en su orden
+    __table_args__ = (
+        Index("ix_series_ejercicios_rutina_orden", "rutina_id", "orden"),
+    )
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    jti = Column(String(36), unique=True, index=True, nullable=False)
+    family_id = Column(String(36), index=True, nullable=False)  # Cadena de rotaciones desde el login
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime)
+    replaced_by = Column(String(36))  # jti del token que lo sustituyó al rotar
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class RevokedToken(Base):
+    """Tokens de acceso revocados antes de expirar (logout)"""
+    __tablename__ = "revoked_tokens"
+    
+    jti = Column(String(36), primary_key=True)
+    expires_at = Column(DateTime, index=True, nullable=False)
+    revoked_at = Column(DateTime, index=True, nullable=False)
+
+class ChangeCounter(Base):
+    """Último valor de cada secuencia de cambios ("exercises" -> Exercise.change_seq)"""
+    __tablename__ = "change_counters"
+    
+    name = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False, default=0, server_default="0")
 
 # Modelos Pydantic (Validación y Serialización)
 
@@ -158,16 +245,54 @@ class ExerciseUpdate(BaseModel):
     nivel_dificultad: Optional[NivelDificultadEnum] = None
     equipo_necesario: Optional[str] = None
     musculos_secundarios: Optional[str] = None
+    is_active: Optional[bool] = None
 
 class ExerciseResponse(ExerciseBase):
     id: int
     imagen_url: Optional[str] = None
+    imagenes: Optional[Dict[str, str]] = None  # {"160": "/images/abs/crunch.png?w=160", ...}
+    imagen_ancho: Optional[int] = None
+    imagen_alto: Optional[int] = None
+    imagen_placeholder: Optional[str] = None
     is_active: bool
     created_at: datetime
     
     class Config:
         from_attributes = True
 
+class ExerciseSummary(BaseModel):
+    id: int
+    nombre: str
+    grupo_muscular: GrupoMuscularEnum
+    nivel_dificultad: NivelDificultadEnum
+    imagenes: Optional[Dict[str, str]] = None
+    imagen_ancho: Optional[int] = None
+    imagen_alto: Optional[int] = None
+    imagen_placeholder: Optional[str] = None
+    
+    class Config:
+        from_attributes = True
+
+class ExerciseChangesResponse(BaseModel):
+    version: int  # Pasar como `since` en la siguiente sincronización
+    has_more: bool
+    next_cursor: Optional[str] = None  # Con has_more: siguiente página (mismo `since`)
+    changes: List[ExerciseResponse]  # Creados, actualizados o desactivados (is_active=False)
+
+# Favoritos schemas
+class FavoritoResponse(BaseModel):
+    message: str
+    total_favoritos: int
+
+class FavoritosBatch(BaseModel):
+    agregar: List[int] = Field([], max_length=200)  # ids de ejercicios
+    quitar: List[int] = Field([], max_length=200)
+
+class FavoritosBatchResponse(BaseModel):
+    agregados: List[int]  # Los que no estaban ya en favoritos
+    quitados: List[int]  # Los que sí estaban
+    total_favoritos: int
+
 # SerieEjercicio schemas
 class SerieEjercicioBase(BaseModel):
     ejercicio_id: int
@@ -191,6 +316,13 @@ class SerieEjercicioUpdate(BaseModel):
     tiempo_descanso: Optional[int] = None
     notas: Optional[str] = None
 
+class SerieEjercicioBatchItem(SerieEjercicioUpdate):
+    id: int
+
+class SerieEjercicioBatch(BaseModel):
+    actualizar: List[SerieEjercicioBatchItem] = []  # Cambios (incluido el nuevo `orden`)
+    eliminar: List[int] = []  # ids de series a quitar
+
 class SerieEjercicioResponse(SerieEjercicioBase):
     id: int
     rutina_id: int
@@ -219,12 +351,37 @@ class RutinaUpdate(BaseModel):
     nivel_dificultad: Optional[NivelDificultadEnum] = None
     is_public: Optional[bool] = None
 
+class RutinaSummary(BaseModel):
+    id: int
+    nombre: str
+    categoria: CategoriaRutinaEnum
+    nivel_dificultad: NivelDificultadEnum
+    duracion_estimada: Optional[int] = None
+    is_public: bool
+    is_template: bool
+    owner_id: Optional[int] = None
+    created_at: datetime
+    total_ejercicios: int = 0
+    total_series: int = 0
+    duracion_calculada: Optional[int] = None
+    grupos_musculares: List[str] = []
+    
+    class Config:
+        from_attributes = True
+
+class RutinaForkRequest(BaseModel):
+    rutina_ids: List[int] = Field(..., min_length=1, max_length=50)
+
 class RutinaResponse(RutinaBase):
     id: int
     owner_id: int
     is_template: bool
     created_at: datetime
     updated_at: Optional[datetime] = None
+    total_ejercicios: int = 0
+    total_series: int = 0
+    duracion_calculada: Optional[int] = None
+    grupos_musculares: List[str] = []
     series: List[SerieEjercicioResponse] = []
     owner: UserResponse
     
@@ -235,6 +392,13 @@ class RutinaResponse(RutinaBase):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
 
 class TokenData(BaseModel):
     username: Optional[str] = None
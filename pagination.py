@@ -0,0 +1,175 @@
+"""
+Paginación por cursor (keyset) para los endpoints de listado
+
+El cursor es opaco para el cliente: codifica en base64 los valores de la clave
+de ordenación del último elemento de la página, p. ej. (created_at, id).
+El siguiente cursor se devuelve en la cabecera X-Next-Cursor, de modo que el
+cuerpo de la respuesta (y skip/limit) sigue igual que antes.
+"""
+import base64
+import bisect
+import binascii
+import json
+from datetime import datetime, timezone
+from typing import Any, Callable, List, Optional, Sequence
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import DateTime, Select, and_, func, or_, select, union
+from sqlalchemy.ext.asyncio import AsyncSession
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Codificar los valores de la clave en un cursor opaco"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> List[Any]:
+    """Decodificar un cursor, convirtiendo cada valor al tipo de su columna"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(types):
+            raise ValueError("cursor length mismatch")
+        return [
+            datetime.fromisoformat(value) if type_ is datetime else type_(value)
+            for value, type_ in zip(payload, types)
+        ]
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def keyset_filter(columns: Sequence, values: Sequence[Any], descending: bool = False):
+    """(c1, c2) > (v1, v2) expandido en OR/AND para que funcione en cualquier motor"""
+    clauses = []
+    for index, (column, value) in enumerate(zip(columns, values)):
+        comparison = column < value if descending else column > value
+        equalities = [prev == prev_value for prev, prev_value in zip(columns[:index], values[:index])]
+        clauses.append(and_(*equalities, comparison))
+    return or_(*clauses)
+
+def _order_by(columns: Sequence, descending: bool) -> list:
+    return [column.desc() if descending else column.asc() for column in columns]
+
+def _cursor_filter(db: AsyncSession, columns: Sequence, cursor: str, descending: bool):
+    """Condición "después del cursor" sobre `columns`"""
+    values = decode_cursor(cursor, [column.type.python_type for column in columns])
+    keys = columns
+    if db.bind.dialect.name == "sqlite":
+        # SQLite compara fechas como texto y CURRENT_TIMESTAMP no guarda microsegundos
+        keys = [func.datetime(column) if isinstance(column.type, DateTime) else column for column in columns]
+        values = [func.datetime(value) if isinstance(value, datetime) else value for value in values]
+    return keyset_filter(keys, values, descending)
+
+def _page(items: Sequence, columns: Sequence, response: Response, limit: int) -> list:
+    """Recortar el elemento extra y, si lo había, anunciar el cursor siguiente"""
+    items = list(items)
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([getattr(last, column.key) for column in columns])
+    return items
+
+async def paginate_query(
+    db: AsyncSession,
+    query: Select,
+    columns: Sequence,
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 20,
+    descending: bool = False
+) -> list:
+    """Aplicar orden estable, cursor (o skip si no hay cursor) y límite a una consulta ORM y ejecutarla"""
+    query = query.order_by(*_order_by(columns, descending))
+
+    if cursor:
+        query = query.filter(_cursor_filter(db, columns, cursor, descending))
+    elif skip:
+        query = query.offset(skip)
+
+    # Un elemento extra indica si hay página siguiente
+    return _page(await db.scalars(query.limit(limit + 1)), columns, response, limit)
+
+async def paginate_union(
+    db: AsyncSession,
+    query: Select,
+    branches: Sequence,
+    columns: Sequence,
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 20,
+    descending: bool = False
+) -> list:
+    """Como paginate_query para `query.where(or_(*branches))`, resuelto como UNION
+
+    Un OR entre columnas distintas obliga a recorrer la tabla; en su lugar cada
+    rama pide por separado sólo las claves de su página (orden, cursor y límite
+    dentro de la rama, servidos por su propio índice), el UNION las combina sin
+    duplicados y la consulta final carga por clave primaria las filas elegidas.
+    `columns` debe terminar en la clave primaria.
+    """
+    needed = skip + limit + 1 if not cursor else limit + 1
+    keys = []
+    for branch in branches:
+        keys_query = select(*columns).where(branch).order_by(*_order_by(columns, descending)).limit(needed)
+        if query.whereclause is not None:
+            keys_query = keys_query.where(query.whereclause)
+        if cursor:
+            keys_query = keys_query.where(_cursor_filter(db, columns, cursor, descending))
+        # Cada rama como subconsulta: SQLite no admite ORDER BY/LIMIT directamente en un UNION
+        keys.append(select(keys_query.subquery()))
+    page_keys = union(*keys).subquery()
+
+    primary_key = columns[-1]
+    query = query.where(primary_key.in_(select(page_keys.c[primary_key.key])))
+    query = query.order_by(*_order_by(columns, descending))
+    if not cursor and skip:
+        query = query.offset(skip)
+    return _page(await db.scalars(query.limit(limit + 1)), columns, response, limit)
+
+def _match_timezone(value: Any, reference: Any) -> Any:
+    """Igualar una fecha del cursor a las de la lista (con o sin zona) para poder compararlas
+
+    Las fechas sin zona son UTC, como las que guarda SQLite.
+    """
+    if not isinstance(value, datetime) or not isinstance(reference, datetime):
+        return value
+    if reference.tzinfo is None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    if reference.tzinfo is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+def paginate_list(
+    items: list,
+    key: Callable[[Any], tuple],
+    types: Sequence[type],
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 20
+) -> list:
+    """Equivalente en memoria de paginate_query para listas ya ordenadas por `key`"""
+    if cursor:
+        values = decode_cursor(cursor, types)
+        if items:
+            values = [_match_timezone(value, reference) for value, reference in zip(values, key(items[0]))]
+        try:
+            start = bisect.bisect_right(items, tuple(values), key=key)
+        except TypeError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+    else:
+        start = skip
+
+    page = items[start:start + limit]
+    if len(page) == limit and start + limit < len(items):
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(key(page[-1]))
+    return page
@@ -3,8 +3,9 @@ Script para crear TODOS los ejercicios basados en las imágenes reales
 """
 import os
 from pathlib import Path
-from database import SessionLocal, engine
-from models import Base, Exercise, Rutina, SerieEjercicio, User
+from database import SessionLocal
+from migrate import upgrade_database
+from models import Exercise, Rutina, SerieEjercicio, User
 from auth import get_password_hash
 
 def clean_exercise_name(filename):
@@ -215,7 +216,7 @@ def populate_all_exercises():
     
     try:
         # Crear tablas si no existen
-        Base.metadata.create_all(bind=engine)
+        upgrade_database()
         
         images_dir = Path("images")
         if not images_dir.exists():
@@ -340,7 +341,7 @@ def main():
     print("🏋️ GAINZ API - Poblando base de datos con TODOS los ejercicios\n")
     
     # Crear todas las tablas
-    Base.metadata.create_all(bind=engine)
+    upgrade_database()
     
     # Poblar ejercicios basados en imágenes
     populate_all_exercises()
@@ -3,9 +3,11 @@ Script para poblar la base de datos con ejercicios e imágenes
 """
 import os
 from sqlalchemy.orm import Session
-from database import SessionLocal, engine
-from models import Base, Exercise, Rutina, SerieEjercicio, User
+from database import SessionLocal
+from migrate import upgrade_database
+from models import Exercise, Rutina, SerieEjercicio, User
 from auth import get_password_hash
+from backfill_routine_summaries import backfill_routine_summaries
 
 # Datos de ejercicios organizados por grupo muscular
 EXERCISES_DATA = {
@@ -563,7 +565,7 @@ def main():
     print("🚀 Iniciando población de la base de datos...")
     
     # Crear tablas si no existen
-    Base.metadata.create_all(bind=engine)
+    upgrade_database()
     
     # Crear sesión de base de datos
     db = SessionLocal()
@@ -574,6 +576,7 @@ def main():
         
         # Crear rutinas de ejemplo
         create_sample_routines(db)
+        backfill_routine_summaries()
         
         # Estadísticas finales
         total_exercises = db.query(Exercise).count()
@@ -0,0 +1,104 @@
+"""
+Caché de usuarios autenticados (principals) para no consultar la base de datos en
+cada petición autenticada
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Set
+
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+PRINCIPAL_CACHE_TTL_SECONDS = int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "300"))
+
+class Principal:
+    """Lo mínimo del usuario que necesitan los endpoints protegidos"""
+
+    __slots__ = ("id", "username", "is_active")
+
+    def __init__(self, id: int, username: str, is_active: bool):
+        self.id = id
+        self.username = username
+        self.is_active = is_active
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(id=user.id, username=user.username, is_active=bool(user.is_active))
+
+class PrincipalCache:
+    """LRU acotado con TTL: token -> principal, invalidable por usuario"""
+
+    def __init__(self, max_entries: int = PRINCIPAL_CACHE_MAX_ENTRIES, ttl_seconds: int = PRINCIPAL_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._keys_by_user: Dict[int, Set[bytes]] = {}
+        self._listeners: List[Callable[[int], None]] = []
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        # Se guarda el hash, no el token
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[Principal]:
+        """Principal en caché para el token (None si no está o expiró)"""
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            principal, expires_at = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return principal
+
+    def put(self, token: str, principal: Principal, token_expires_at: Optional[float] = None) -> None:
+        """Guardar el principal hasta el TTL o la expiración del token (lo que ocurra antes)"""
+        expires_at = time.time() + self.ttl_seconds
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+
+        key = self._key(token)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (principal, expires_at)
+            self._keys_by_user.setdefault(principal.id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: bytes) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._keys_by_user.get(entry[0].id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[entry[0].id]
+
+    def invalidate_user(self, user_id: int, broadcast: bool = True) -> None:
+        """Olvidar todos los tokens de un usuario (y avisar al resto de workers)"""
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._remove(key)
+        if broadcast:
+            for listener in self._listeners:
+                listener(user_id)
+
+    def add_invalidation_listener(self, listener: Callable[[int], None]) -> None:
+        """Hook para propagar invalidaciones a otros workers (pub/sub, etc.)
+
+        El receptor remoto debe llamar a invalidate_user(user_id, broadcast=False).
+        """
+        self._listeners.append(listener)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+principal_cache = PrincipalCache()
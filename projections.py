@@ -0,0 +1,43 @@
+"""
+Proyecciones de los listados: vista resumida (`view=summary`) y campos a medida (`fields=`)
+"""
+from functools import lru_cache
+from typing import Optional, Tuple, Type
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel, ConfigDict, create_model
+
+from models import ListViewEnum
+
+@lru_cache(maxsize=256)
+def sparse_schema(schema: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """Esquema con sólo `fields` de `schema` (el id siempre se incluye)"""
+    selected = ("id",) + tuple(name for name in fields if name != "id")
+    return create_model(
+        f"{schema.__name__}Fields",
+        __config__=ConfigDict(from_attributes=True),
+        **{name: (schema.model_fields[name].annotation, schema.model_fields[name]) for name in selected}
+    )
+
+def _parse_fields(fields: str, schema: Type[BaseModel]) -> Tuple[str, ...]:
+    requested = tuple(sorted({name.strip() for name in fields.split(",") if name.strip()}))
+    unknown = [name for name in requested if name not in schema.model_fields]
+    if unknown or not requested:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown) or fields}"
+        )
+    return requested
+
+def list_schema(
+    full: Type[BaseModel],
+    summary: Type[BaseModel],
+    view: Optional[ListViewEnum] = None,
+    fields: Optional[str] = None
+) -> Type[BaseModel]:
+    """Esquema de cada elemento del listado según `fields` (prioritario) o `view`"""
+    if fields:
+        return sparse_schema(full, _parse_fields(fields, full))
+    if view == ListViewEnum.SUMMARY:
+        return summary
+    return full
@@ -9,4 +9,8 @@ pip install -r requirements.txt
 echo "🗄️ Inicializando base de datos..."
 python init_db.py
 
+# Generar variantes optimizadas de las imágenes y sus placeholders
+echo "🖼️ Generando variantes de imágenes..."
+python build_images.py --db
+
 echo "✅ Despliegue completado"
\ No newline at end of file
@@ -0,0 +1,192 @@
+"""
+Caché de respuestas HTTP ya serializadas para los endpoints públicos de sólo lectura
+
+La clave es la ruta más la query normalizada; el valor, los bytes de la respuesta
+con sus cabeceras (ETag incluido, así que un acierto también resuelve el 304).
+Cada entrada lleva etiquetas por entidad ("exercise:42", "templates") y los
+endpoints de escritura invalidan por etiqueta.
+
+Backends:
+- Memoria (por defecto): LRU por proceso. La invalidación sólo alcanza al worker
+  que escribe; el resto converge al caducar el TTL (igual que el catálogo).
+- Redis (RESPONSE_CACHE_URL=redis://...): compartida entre workers. La
+  invalidación borra las entradas para todos, pero no refresca el catálogo de
+  ejercicios en memoria de cada worker: hasta CATALOG_TTL_SECONDS otro worker
+  puede seguir sirviendo (y volver a guardar) los datos anteriores.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from fastapi import Request, Response, status
+
+from http_cache import etag_matches
+from metrics import registry
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # Sólo hace falta con RESPONSE_CACHE_URL=redis://...
+    redis_asyncio = None
+
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "")
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "60"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048"))
+RESPONSE_CACHE_PREFIX = os.getenv("RESPONSE_CACHE_PREFIX", "gainz:response:")
+
+# Cabeceras que se guardan con el cuerpo (el resto las pone el servidor)
+CACHED_HEADERS = ("etag", "cache-control", "vary", "x-next-cursor", "content-encoding")
+
+class MemoryBackend:
+    """LRU en memoria con caducidad e índice etiqueta -> claves"""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, bytes, Tuple[str, ...]]]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+
+    def _forget(self, key: str) -> None:
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    async def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._forget(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    async def set(self, key: str, value: bytes, tags: Iterable[str], ttl: int) -> None:
+        tags = tuple(tags)
+        with self._lock:
+            if key in self._entries:
+                self._forget(key)
+            self._entries[key] = (time.monotonic() + ttl, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._forget(next(iter(self._entries)))
+
+    async def invalidate(self, tags: Iterable[str]) -> None:
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._forget(key)
+
+class RedisBackend:
+    """Entradas con SET ... EX y un SET de Redis por etiqueta con sus claves
+
+    `client` es un redis.asyncio.Redis o cualquier objeto con la misma interfaz
+    (get, pipeline con set/sadd/expire, smembers, delete), p. ej. fakeredis.
+    """
+
+    def __init__(self, client, prefix: str = RESPONSE_CACHE_PREFIX):
+        self.client = client
+        self.prefix = prefix
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}tag:{tag}"
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes, tags: Iterable[str], ttl: int) -> None:
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.set(self.prefix + key, value, ex=ttl)
+        for tag in tags:
+            # El índice de la etiqueta vive al menos tanto como sus entradas
+            pipeline.sadd(self._tag_key(tag), self.prefix + key)
+            pipeline.expire(self._tag_key(tag), ttl)
+        await pipeline.execute()
+
+    async def invalidate(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            keys = await self.client.smembers(self._tag_key(tag))
+            await self.client.delete(self._tag_key(tag), *keys)
+
+def create_backend(url: str = RESPONSE_CACHE_URL):
+    """Backend según RESPONSE_CACHE_URL (vacía: memoria)"""
+    if not url:
+        return MemoryBackend()
+    if redis_asyncio is None:
+        raise RuntimeError("RESPONSE_CACHE_URL requires the 'redis' package")
+    return RedisBackend(redis_asyncio.from_url(url))
+
+def cache_key(request: Request) -> str:
+    """Ruta + query normalizada (parámetros ordenados, sin valores vacíos)"""
+    params = sorted((name, value) for name, value in request.query_params.multi_items() if value != "")
+    query = "&".join(f"{name}={value}" for name, value in params)
+    return f"{request.url.path}?{query}"
+
+def _encode(response: Response) -> bytes:
+    headers = {name: value for name, value in response.headers.items() if name in CACHED_HEADERS}
+    return json.dumps([response.media_type, headers]).encode() + b"\n" + response.body
+
+def _decode(value: bytes) -> Tuple[str, Dict[str, str], bytes]:
+    meta, body = value.split(b"\n", 1)
+    media_type, headers = json.loads(meta)
+    return media_type, headers, body
+
+class ResponseCache:
+    """Fachada usada por los endpoints: servir desde caché e invalidar por etiqueta"""
+
+    def __init__(self, backend, ttl: int = RESPONSE_CACHE_TTL_SECONDS):
+        self.backend = backend
+        self.ttl = ttl
+        self.requests = registry.counter(
+            "response_cache_requests_total", "Cacheable requests by result", label="result"
+        )
+
+    async def serve(
+        self,
+        request: Request,
+        tags: Iterable[str],
+        build: Callable[[], Awaitable[Response]]
+    ) -> Response:
+        """Respuesta guardada (o 304) si la hay; si no, `build()` y guardarla si es un 200
+
+        `tags` se lee después de `build()`, que puede añadir las de las filas que cargó.
+        """
+        key = cache_key(request)
+        try:
+            cached = await self.backend.get(key)
+        except Exception as error:  # Sin caché se sigue sirviendo, sólo más lento
+            print(f"⚠️  Error leyendo la caché de respuestas: {error}")
+            cached = None
+
+        if cached is not None:
+            self.requests.inc(label_value="hit")
+            media_type, headers, body = _decode(cached)
+            if "etag" in headers and etag_matches(request, headers["etag"]):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+            return Response(content=body, media_type=media_type, headers=headers)
+
+        self.requests.inc(label_value="miss")
+        response = await build()
+        if response.status_code == status.HTTP_200_OK:
+            try:
+                await self.backend.set(key, _encode(response), dict.fromkeys(tags), self.ttl)
+            except Exception as error:
+                print(f"⚠️  Error guardando en la caché de respuestas: {error}")
+        return response
+
+    async def invalidate(self, *tags: str) -> None:
+        """Descartar las respuestas con alguna de `tags` (llamar tras el commit)"""
+        try:
+            await self.backend.invalidate(tags)
+        except Exception as error:  # Las entradas caducan igualmente con el TTL
+            print(f"⚠️  Error invalidando la caché de respuestas: {error}")
+
+response_cache = ResponseCache(create_backend())
@@ -0,0 +1,85 @@
+"""
+Lista de tokens de acceso revocados en memoria, persistida en la base de datos
+
+La comprobación en cada petición es un lookup O(1) en un diccionario; los workers
+se sincronizan leyendo periódicamente las revocaciones nuevas de revoked_tokens.
+Sólo hace falta recordar cada jti hasta que su token expira, así que el conjunto
+se mantiene pequeño.
+"""
+import asyncio
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal
+from models import RevokedToken
+
+REVOCATION_SYNC_SECONDS = int(os.getenv("REVOCATION_SYNC_SECONDS", "15"))
+# Margen al leer revocaciones de otros workers (relojes no sincronizados, commits tardíos)
+REVOCATION_SYNC_OVERLAP = timedelta(seconds=60)
+
+class RevocationList:
+    """jti -> expiración de los tokens de acceso revocados"""
+
+    def __init__(self, sync_seconds: int = REVOCATION_SYNC_SECONDS):
+        self.sync_seconds = sync_seconds
+        self._lock = threading.Lock()
+        self._revoked: Dict[str, datetime] = {}
+        self._synced_until: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        """Comprobar si el token fue revocado (sin acceso a la base de datos)"""
+        return jti is not None and jti in self._revoked
+
+    async def revoke(self, db: AsyncSession, jti: str, expires_at: datetime) -> None:
+        """Revocar un token de acceso en este worker y persistirlo para el resto (sin commit)"""
+        with self._lock:
+            self._revoked[jti] = expires_at
+        if await db.get(RevokedToken, jti) is None:
+            db.add(RevokedToken(jti=jti, expires_at=expires_at, revoked_at=datetime.utcnow()))
+
+    async def sync(self, db: Optional[AsyncSession] = None) -> None:
+        """Incorporar las revocaciones nuevas de la base de datos y olvidar las expiradas"""
+        if db is None:
+            async with AsyncSessionLocal() as session:
+                return await self.sync(session)
+
+        now = datetime.utcnow()
+        query = select(RevokedToken.jti, RevokedToken.expires_at).where(RevokedToken.expires_at > now)
+        if self._synced_until is not None:
+            query = query.where(RevokedToken.revoked_at >= self._synced_until - REVOCATION_SYNC_OVERLAP)
+        rows = (await db.execute(query)).all()
+
+        with self._lock:
+            self._revoked.update({row.jti: row.expires_at for row in rows})
+            self._revoked = {jti: expires for jti, expires in self._revoked.items() if expires > now}
+        self._synced_until = now
+
+        # Limpieza: las filas de tokens ya expirados no sirven a nadie
+        await db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+        await db.commit()
+
+    async def _sync_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_seconds)
+            try:
+                await self.sync()
+            except Exception as error:  # La siguiente vuelta lo vuelve a intentar
+                print(f"⚠️  Error sincronizando tokens revocados: {error}")
+
+    async def start(self) -> None:
+        """Carga inicial y sincronización periódica en segundo plano"""
+        await self.sync()
+        self._task = asyncio.create_task(self._sync_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+revocation_list = RevocationList()
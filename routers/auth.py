@@ -1,64 +1,133 @@
 """
 Router para autenticación de usuarios
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from datetime import timedelta
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta
 from typing import Optional
 
-from database import get_db
-from models import User, UserCreate, UserResponse, Token, LoginRequest
-from auth import verify_password, get_password_hash, create_access_token, verify_token
+from database import get_async_db
+from models import (
+    User, UserCreate, UserResponse, Token,
+    RefreshToken, RefreshTokenRequest, LogoutRequest
+)
+from auth import (
+    verify_and_update_password_async, get_password_hash_async, create_access_token, create_refresh_token,
+    decode_token, new_jti, ACCESS_TOKEN_TYPE, REFRESH_TOKEN_TYPE, REFRESH_TOKEN_EXPIRE_DAYS
+)
+from principal_cache import Principal, principal_cache
+from throttle import client_ip, login_throttle
+from revocation import revocation_list
 
 router = APIRouter()
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
+# Token de acceso opcional: sólo para la forma antigua de /refresh-token
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login", auto_error=False)
 
-def get_user_by_email(db: Session, email: str) -> Optional[User]:
-    """Obtener usuario por email"""
-    return db.query(User).filter(User.email == email).first()
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    """Obtener usuario por email (sin distinguir mayúsculas)"""
+    return await db.scalar(select(User).where(func.lower(User.email) == email.lower()).limit(1))
 
-def get_user_by_username(db: Session, username: str) -> Optional[User]:
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
     """Obtener usuario por username"""
-    return db.query(User).filter(User.username == username).first()
+    return await db.scalar(select(User).where(User.username == username).limit(1))
 
-def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
-    """Autenticar usuario"""
-    user = get_user_by_username(db, username)
-    if not user:
-        user = get_user_by_email(db, username)  # Permitir login con email
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> Optional[User]:
+    """Autenticar usuario por username o email (una sola consulta)"""
+    candidates = (await db.scalars(
+        select(User).where(or_(
+            User.username == username, func.lower(User.email) == username.lower()
+        )).limit(2)
+    )).all()
+    # Si un username coincide con el email de otro usuario, gana el username
+    user = next((candidate for candidate in candidates if candidate.username == username), None)
+    if user is None and candidates:
+        user = candidates[0]
     
-    if not user or not verify_password(password, user.hashed_password):
+    # Con usuario inexistente también se paga un verify (coste constante)
+    verified, new_hash = await verify_and_update_password_async(
+        password, user.hashed_password if user else None
+    )
+    if not verified:
         return None
+    if new_hash:
+        # Hash con otro esquema o coste: se actualiza sin pedir un cambio de contraseña
+        # (se guarda con el commit del login)
+        user.hashed_password = new_hash
     return user
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    """Obtener usuario actual desde el token"""
-    credentials_exception = HTTPException(
+def _issue_tokens(db: AsyncSession, user: User, family_id: Optional[str] = None) -> tuple:
+    """Token de acceso + refresh token nuevo (registrado en la sesión, sin commit)"""
+    jti = new_jti()
+    expires_at = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    db.add(RefreshToken(jti=jti, family_id=family_id or jti, user_id=user.id, expires_at=expires_at))
+
+    access_token = create_access_token(
+        data={"sub": user.username}, expires_delta=timedelta(minutes=30)
+    )
+    tokens = {
+        "access_token": access_token,
+        "refresh_token": create_refresh_token(user.username, jti, expires_at),
+        "token_type": "bearer",
+    }
+    return tokens, jti
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
-    username = verify_token(token, credentials_exception)
-    user = get_user_by_username(db, username)
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> Principal:
+    """Obtener usuario actual desde el token (sin consultar la base de datos si está en caché)"""
+    credentials_exception = _credentials_exception()
+    payload = decode_token(token, credentials_exception)
+    # Los refresh tokens sólo valen en /refresh-token; la revocación se comprueba en memoria
+    if payload.get("type", ACCESS_TOKEN_TYPE) != ACCESS_TOKEN_TYPE or revocation_list.is_revoked(payload.get("jti")):
+        raise credentials_exception
+
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+
+    user = await get_user_by_username(db, payload["sub"])
     if user is None:
         raise credentials_exception
-    return user
 
-def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+    principal = Principal.from_user(user)
+    principal_cache.put(token, principal, token_expires_at=payload.get("exp"))
+    return principal
+
+def get_current_active_user(current_user: Principal = Depends(get_current_user)) -> Principal:
     """Obtener usuario activo actual"""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+async def get_current_user_record(
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """Fila completa del usuario actual, para los endpoints que la leen o modifican"""
+    user = await db.get(User, current_user.id)
+    if user is None:
+        principal_cache.invalidate_user(current_user.id)
+        raise _credentials_exception()
+    return user
+
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Registrar nuevo usuario"""
     # Verificar si el email ya existe
-    db_user = get_user_by_email(db, user.email)
+    db_user = await get_user_by_email(db, user.email)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -66,7 +135,7 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Verificar si el username ya existe
-    db_user = get_user_by_username(db, user.username)
+    db_user = await get_user_by_username(db, user.username)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -74,7 +143,7 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Crear nuevo usuario
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     db_user = User(
         email=user.email,
         username=user.username,
@@ -83,40 +152,136 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
 @router.post("/login", response_model=Token)
-async def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_user(
+    request: Request,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_async_db)
+):
     """Login de usuario con username/email y password"""
-    user = authenticate_user(db, form_data.username, form_data.password)
+    ip = client_ip(request)
+    # Se rechaza antes de cualquier trabajo de bcrypt
+    retry_after = login_throttle.check(form_data.username, ip)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, please retry later",
+            headers={"Retry-After": str(max(1, round(retry_after)))},
+        )
+
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
+        login_throttle.failure(form_data.username, ip)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token_expires = timedelta(minutes=30)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
+    login_throttle.success(form_data.username, ip)
+    tokens, _ = _issue_tokens(db, user)
+    await db.commit()
     
-    return {"access_token": access_token, "token_type": "bearer"}
+    return tokens
 
 @router.get("/me", response_model=UserResponse)
-async def read_users_me(current_user: User = Depends(get_current_active_user)):
+async def read_users_me(current_user: User = Depends(get_current_user_record)):
     """Obtener información del usuario actual"""
     return current_user
 
+async def _refresh_legacy(token: Optional[str], response: Response, db: AsyncSession) -> dict:
+    """Forma antigua (obsoleta): sin body, con el token de acceso en Authorization
+
+    Los clientes anteriores a los refresh tokens reciben aquí su primer par de
+    tokens (una familia nueva) y a partir de entonces usan la forma con body.
+    """
+    if token is None:
+        raise _credentials_exception()
+    principal = get_current_active_user(await get_current_user(token, db))
+    user = await db.get(User, principal.id)
+    if user is None:
+        raise _credentials_exception()
+
+    tokens, _ = _issue_tokens(db, user)
+    await db.commit()
+    response.headers["Deprecation"] = "true"
+    return tokens
+
 @router.post("/refresh-token", response_model=Token)
-async def refresh_token(current_user: User = Depends(get_current_active_user)):
-    """Renovar token de acceso"""
-    access_token_expires = timedelta(minutes=30)
-    access_token = create_access_token(
-        data={"sub": current_user.username}, expires_delta=access_token_expires
-    )
+async def refresh_token(
+    response: Response,
+    body: Optional[RefreshTokenRequest] = None,
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Rotar el refresh token: nuevo token de acceso y nuevo refresh token (el anterior deja de valer)"""
+    if body is None:
+        return await _refresh_legacy(token, response, db)
+
+    credentials_exception = _credentials_exception()
+    payload = decode_token(body.refresh_token, credentials_exception)
+    if payload.get("type") != REFRESH_TOKEN_TYPE or "jti" not in payload:
+        raise credentials_exception
+
+    # El token y su usuario en una sola consulta (bloqueando el token para rotarlo una vez)
+    row = (await db.execute(
+        select(RefreshToken, User).join(User, User.id == RefreshToken.user_id)
+        .where(RefreshToken.jti == payload["jti"])
+        .with_for_update(of=RefreshToken)
+    )).first()
+    if row is None:
+        raise credentials_exception
+    stored, user = row
+
+    now = datetime.utcnow()
+    if stored.revoked_at is not None:
+        # Reutilización de un token ya rotado: posible robo, se revoca toda la familia
+        await db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.family_id == stored.family_id, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=now)
+        )
+        await db.commit()
+        raise credentials_exception
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+
+    tokens, jti = _issue_tokens(db, user, family_id=stored.family_id)
+    stored.revoked_at = now
+    stored.replaced_by = jti
+    await db.commit()
     
-    return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
+    return tokens
+
+@router.post("/logout")
+async def logout(
+    body: Optional[LogoutRequest] = None,
+    token: str = Depends(oauth2_scheme),
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Revocar el token de acceso actual (y la sesión de refresh tokens si se envía)"""
+    payload = decode_token(token, _credentials_exception())
+    if "jti" in payload:
+        await revocation_list.revoke(db, payload["jti"], datetime.utcfromtimestamp(payload["exp"]))
+
+    if body is not None and body.refresh_token:
+        refresh_payload = decode_token(body.refresh_token, _credentials_exception())
+        family_id = await db.scalar(select(RefreshToken.family_id).where(
+            RefreshToken.jti == refresh_payload.get("jti"),
+            RefreshToken.user_id == current_user.id
+        ))
+        if family_id is not None:
+            await db.execute(
+                update(RefreshToken)
+                .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+                .values(revoked_at=datetime.utcnow())
+            )
+
+    await db.commit()
+    return {"message": "Logged out successfully"}
\ No newline at end of file
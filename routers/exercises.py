@@ -1,130 +1,315 @@
 """
 Router para gestión de ejercicios
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, func, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Iterable, List, Optional
+from datetime import datetime
 
-from database import get_db
+from database import get_async_db
 from models import (
-    Exercise, ExerciseResponse, ExerciseCreate, ExerciseUpdate, 
-    User, GrupoMuscularEnum, NivelDificultadEnum, user_favorite_exercises
+    Exercise, ExerciseResponse, ExerciseSummary, ExerciseCreate, ExerciseUpdate, ExerciseChangesResponse,
+    FavoritoResponse, FavoritosBatch, FavoritosBatchResponse, GrupoMuscularEnum, NivelDificultadEnum, ListViewEnum, user_favorite_exercises
 )
 from routers.auth import get_current_active_user
+from principal_cache import Principal
+from catalog import exercise_catalog, next_change_seq
+from search import apply_search
+from pagination import (
+    NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, keyset_filter, paginate_list, paginate_query
+)
+from http_cache import CACHE_POLICIES, compute_etag, conditional_response, etag_matches, json_response, render_json
+from loaders import projection_options
+from projections import list_schema
+from response_cache import response_cache
 
 router = APIRouter()
 
+def _catalog_key(exercise: ExerciseResponse) -> tuple:
+    """Clave de orden del catálogo para la paginación por cursor"""
+    return (exercise.created_at, exercise.id)
+
+# INSERT con ON CONFLICT DO NOTHING según el motor (los dos que soporta database.py)
+INSERT_IGNORING_CONFLICTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+def _add_favorites(db: AsyncSession, user_id: int, exercise_ids: Iterable[int]):
+    """INSERT ... SELECT de los ejercicios que existen, ignorando los que ya son favoritos
+
+    Una sola sentencia sin carrera entre comprobar e insertar; RETURNING da los añadidos.
+    """
+    insert_ = INSERT_IGNORING_CONFLICTS[db.bind.dialect.name]
+    return insert_(user_favorite_exercises).from_select(
+        ["user_id", "exercise_id"],
+        select(literal(user_id), Exercise.id).where(Exercise.id.in_(list(exercise_ids)))
+    ).on_conflict_do_nothing().returning(user_favorite_exercises.c.exercise_id)
+
+def _remove_favorites(user_id: int, exercise_ids: Iterable[int]):
+    """DELETE ... RETURNING: da los que de verdad eran favoritos"""
+    return delete(user_favorite_exercises).where(
+        user_favorite_exercises.c.user_id == user_id,
+        user_favorite_exercises.c.exercise_id.in_(list(exercise_ids))
+    ).returning(user_favorite_exercises.c.exercise_id)
+
+async def _count_favorites(db: AsyncSession, user_id: int) -> int:
+    """Total de favoritos (sólo el índice de la clave primaria, sin cargar la colección)"""
+    return await db.scalar(
+        select(func.count()).select_from(user_favorite_exercises)
+        .where(user_favorite_exercises.c.user_id == user_id)
+    )
+
+async def _exercise_exists(db: AsyncSession, exercise_id: int) -> bool:
+    return await db.scalar(select(Exercise.id).where(Exercise.id == exercise_id)) is not None
+
 @router.get("/", response_model=List[ExerciseResponse])
 async def get_exercises(
+    request: Request,
+    response: Response,
     grupo_muscular: Optional[GrupoMuscularEnum] = None,
     nivel_dificultad: Optional[NivelDificultadEnum] = None,
     search: Optional[str] = None,
+    cursor: Optional[str] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db)
+    view: Optional[ListViewEnum] = None,
+    fields: Optional[str] = Query(None, description="Campos separados por comas, p. ej. nombre,imagenes"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Obtener lista de ejercicios con filtros opcionales"""
-    query = db.query(Exercise).filter(Exercise.is_active == True)
-    
-    # Filtros
-    if grupo_muscular:
-        query = query.filter(Exercise.grupo_muscular == grupo_muscular.value)
-    
-    if nivel_dificultad:
-        query = query.filter(Exercise.nivel_dificultad == nivel_dificultad.value)
-    
-    if search:
-        search_term = f"%{search.lower()}%"
-        query = query.filter(
-            or_(
-                Exercise.nombre.ilike(search_term),
-                Exercise.descripcion.ilike(search_term),
-                Exercise.equipo_necesario.ilike(search_term)
+    """Obtener lista de ejercicios con filtros opcionales (paginación por skip o cursor)"""
+    if search and cursor:
+        # Los resultados de búsqueda van por relevancia, sin clave para el cursor
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="cursor cannot be combined with search; use skip and limit"
+        )
+
+    async def build() -> Response:
+        schema = list_schema(ExerciseResponse, ExerciseSummary, view, fields)
+        grupo = grupo_muscular.value if grupo_muscular else None
+        nivel = nivel_dificultad.value if nivel_dificultad else None
+
+        # El resultado sólo depende del catálogo y de los parámetros de la petición
+        etag = compute_etag(
+            "exercises", exercise_catalog.fingerprint, sorted(request.query_params.multi_items())
+        )
+
+        if etag_matches(request, etag):
+            # Sin consultar el índice de búsqueda si el cliente ya tiene esta página
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers=CACHE_POLICIES["exercise_list"].headers(etag)
             )
+
+        if search:
+            # El índice de búsqueda devuelve ids ordenados por relevancia; los datos salen del catálogo.
+            # Al ordenar por relevancia no hay clave estable, así que se pagina con skip/limit
+            query = select(Exercise.id).where(Exercise.is_active == True)
+            if grupo:
+                query = query.where(Exercise.grupo_muscular == grupo)
+            if nivel:
+                query = query.where(Exercise.nivel_dificultad == nivel)
+            query = apply_search(query, Exercise, search, db.bind.dialect.name)
+
+            exercise_ids = (await db.scalars(query.offset(skip).limit(limit))).all()
+            exercises = [exercise_catalog.get(exercise_id) for exercise_id in exercise_ids]
+            exercises = [exercise for exercise in exercises if exercise is not None]
+        else:
+            # Servido desde el catálogo en memoria, sin ir a la base de datos
+            exercises = paginate_list(
+                exercise_catalog.list(grupo_muscular=grupo, nivel_dificultad=nivel),
+                _catalog_key, (datetime, int), response,
+                cursor=cursor, skip=skip, limit=limit
+            )
+
+        return conditional_response(
+            request, etag, CACHE_POLICIES["exercise_list"],
+            lambda: render_json(List[schema], exercises), response
         )
     
-    exercises = query.offset(skip).limit(limit).all()
-    return exercises
+    return await response_cache.serve(request, ["exercises"], build)
 
 @router.get("/grupos-musculares")
-async def get_muscle_groups():
+async def get_muscle_groups(request: Request):
     """Obtener lista de grupos musculares disponibles"""
-    return {
-        "grupos_musculares": [grupo.value for grupo in GrupoMuscularEnum]
-    }
+    async def build() -> Response:
+        return JSONResponse({
+            "grupos_musculares": [grupo.value for grupo in GrupoMuscularEnum]
+        })
+    
+    return await response_cache.serve(request, [], build)
+
+@router.get("/catalog")
+async def get_exercise_catalog(request: Request):
+    """Catálogo completo (ejercicios, enums e imágenes) en una sola respuesta precomprimida"""
+    snapshot = exercise_catalog.snapshot
+    use_gzip = "gzip" in request.headers.get("accept-encoding", "")
+
+    # Cada codificación tiene su propio ETag fuerte
+    etag = f'"{snapshot.version}-gzip"' if use_gzip else f'"{snapshot.version}"'
+    headers = CACHE_POLICIES["exercise_catalog"].headers(etag)
+    headers["X-Catalog-Version"] = snapshot.version
+
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=snapshot.gzip_body, media_type="application/json", headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+@router.get("/changes", response_model=ExerciseChangesResponse)
+async def get_exercise_changes(
+    response: Response,
+    since: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Ejercicios creados, actualizados o desactivados después de la versión `since`
+
+    Varios ejercicios pueden compartir secuencia, así que se pagina por
+    (change_seq, id): mientras `has_more`, pedir `cursor=next_cursor` con el mismo
+    `since`. `version` sólo llega hasta la última secuencia completa devuelta.
+    """
+    columns = [Exercise.change_seq, Exercise.id]
+    query = select(Exercise).where(Exercise.change_seq > since)
+    if cursor:
+        query = query.where(keyset_filter(columns, decode_cursor(cursor, [int, int])))
+    rows = (await db.scalars(query.order_by(*columns).limit(limit + 1))).all()
+
+    changes = rows[:limit]
+    has_more = len(rows) > limit
+    next_cursor = None
+    if has_more:
+        last = changes[-1]
+        next_cursor = encode_cursor([last.change_seq, last.id])
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        # Si la página corta una secuencia, ésa todavía no se puede dar por vista
+        complete = last.change_seq if rows[limit].change_seq > last.change_seq else last.change_seq - 1
+        version = max(since, complete)
+    else:
+        version = changes[-1].change_seq if changes else max(since, exercise_catalog.version)
+    return {"version": version, "has_more": has_more, "next_cursor": next_cursor, "changes": changes}
 
 @router.get("/favoritos", response_model=List[ExerciseResponse])
 async def get_favorite_exercises(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=100),
+    view: Optional[ListViewEnum] = None,
+    fields: Optional[str] = None,
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtener ejercicios favoritos del usuario"""
-    return current_user.ejercicios_favoritos
+    schema = list_schema(ExerciseResponse, ExerciseSummary, view, fields)
+    # Sólo las columnas que se van a serializar
+    query = select(Exercise).options(*projection_options(Exercise, schema)).join(
+        user_favorite_exercises, user_favorite_exercises.c.exercise_id == Exercise.id
+    ).where(user_favorite_exercises.c.user_id == current_user.id)
+
+    favoritos = await paginate_query(
+        db, query, [Exercise.id], response,
+        cursor=cursor, skip=skip, limit=limit
+    )
+    return json_response(List[schema], favoritos, response)
+
+@router.patch("/favoritos", response_model=FavoritosBatchResponse)
+async def update_favorite_exercises(
+    batch: FavoritosBatch,
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Agregar y quitar varios favoritos a la vez; devuelve los cambios efectivos y el total"""
+    agregar, quitar = set(batch.agregar), set(batch.quitar)
+    if agregar & quitar:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Each exercise can appear only once in the batch"
+        )
+    
+    agregados = []
+    if agregar:
+        agregados = (await db.scalars(_add_favorites(db, current_user.id, agregar))).all()
+        # Los que no se insertaron ya estaban en favoritos... o no existen
+        pendientes = agregar - set(agregados)
+        if pendientes:
+            existentes = set((await db.scalars(
+                select(Exercise.id).where(Exercise.id.in_(pendientes))
+            )).all())
+            missing = sorted(pendientes - existentes)
+            if missing:
+                await db.rollback()
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Exercise with id {missing[0]} not found"
+                )
+    
+    quitados = []
+    if quitar:
+        quitados = (await db.scalars(_remove_favorites(current_user.id, quitar))).all()
+    
+    total = await _count_favorites(db, current_user.id)
+    await db.commit()
+    return {"agregados": sorted(agregados), "quitados": sorted(quitados), "total_favoritos": total}
 
-@router.post("/favoritos/{exercise_id}")
+@router.post("/favoritos/{exercise_id}", response_model=FavoritoResponse)
 async def add_favorite_exercise(
     exercise_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Agregar ejercicio a favoritos"""
-    # Verificar que el ejercicio existe
-    exercise = db.query(Exercise).filter(Exercise.id == exercise_id).first()
-    if not exercise:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Exercise not found"
-        )
+    added = (await db.scalars(_add_favorites(db, current_user.id, [exercise_id]))).all()
     
-    # Verificar si ya está en favoritos
-    if exercise in current_user.ejercicios_favoritos:
+    # Sin fila insertada: el ejercicio no existe, o ya era favorito
+    if not added:
+        if not await _exercise_exists(db, exercise_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Exercise not found"
+            )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Exercise already in favorites"
         )
     
-    # Agregar a favoritos
-    current_user.ejercicios_favoritos.append(exercise)
-    db.commit()
-    
-    return {"message": "Exercise added to favorites"}
+    total = await _count_favorites(db, current_user.id)
+    await db.commit()
+    return {"message": "Exercise added to favorites", "total_favoritos": total}
 
-@router.delete("/favoritos/{exercise_id}")
+@router.delete("/favoritos/{exercise_id}", response_model=FavoritoResponse)
 async def remove_favorite_exercise(
     exercise_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Remover ejercicio de favoritos"""
-    # Verificar que el ejercicio existe
-    exercise = db.query(Exercise).filter(Exercise.id == exercise_id).first()
-    if not exercise:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Exercise not found"
-        )
+    removed = (await db.scalars(_remove_favorites(current_user.id, [exercise_id]))).all()
     
-    # Verificar si está en favoritos
-    if exercise not in current_user.ejercicios_favoritos:
+    # Sin fila borrada: el ejercicio no existe, o no era favorito
+    if not removed:
+        if not await _exercise_exists(db, exercise_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Exercise not found"
+            )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Exercise not in favorites"
         )
     
-    # Remover de favoritos
-    current_user.ejercicios_favoritos.remove(exercise)
-    db.commit()
-    
-    return {"message": "Exercise removed from favorites"}
+    total = await _count_favorites(db, current_user.id)
+    await db.commit()
+    return {"message": "Exercise removed from favorites", "total_favoritos": total}
 
 @router.get("/{exercise_id}", response_model=ExerciseResponse)
-async def get_exercise(exercise_id: int, db: Session = Depends(get_db)):
+async def get_exercise(exercise_id: int, request: Request):
     """Obtener un ejercicio específico por ID"""
-    exercise = db.query(Exercise).filter(
-        Exercise.id == exercise_id,
-        Exercise.is_active == True
-    ).first()
+    exercise = exercise_catalog.get(exercise_id)
     
     if not exercise:
         raise HTTPException(
@@ -132,46 +317,61 @@ async def get_exercise(exercise_id: int, db: Session = Depends(get_db)):
             detail="Exercise not found"
         )
     
-    return exercise
+    etag = compute_etag("exercise", exercise_id, exercise_catalog.etag_for(exercise_id))
+    return conditional_response(
+        request, etag, CACHE_POLICIES["exercise_detail"],
+        lambda: exercise.model_dump_json().encode()
+    )
 
 @router.get("/grupo/{grupo_muscular}", response_model=List[ExerciseResponse])
 async def get_exercises_by_muscle_group(
     grupo_muscular: GrupoMuscularEnum,
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
-    db: Session = Depends(get_db)
+    view: Optional[ListViewEnum] = None,
+    fields: Optional[str] = None
 ):
     """Obtener ejercicios por grupo muscular específico"""
-    exercises = db.query(Exercise).filter(
-        Exercise.grupo_muscular == grupo_muscular.value,
-        Exercise.is_active == True
-    ).offset(skip).limit(limit).all()
+    async def build() -> Response:
+        schema = list_schema(ExerciseResponse, ExerciseSummary, view, fields)
+        exercises = exercise_catalog.list(grupo_muscular=grupo_muscular.value)
+        page = paginate_list(
+            exercises, _catalog_key, (datetime, int), response,
+            cursor=cursor, skip=skip, limit=limit
+        )
+        return json_response(List[schema], page, response)
     
-    return exercises
+    return await response_cache.serve(request, ["exercises"], build)
 
 # Endpoints administrativos (requieren permisos especiales en producción)
 @router.post("/", response_model=ExerciseResponse, status_code=status.HTTP_201_CREATED)
 async def create_exercise(
     exercise: ExerciseCreate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Crear nuevo ejercicio (admin)"""
     db_exercise = Exercise(**exercise.dict())
+    db_exercise.change_seq = await db.scalar(next_change_seq())
     db.add(db_exercise)
-    db.commit()
-    db.refresh(db_exercise)
+    await db.commit()
+    await db.refresh(db_exercise)
+    await exercise_catalog.refresh(db)
+    await response_cache.invalidate("exercises")
     return db_exercise
 
 @router.put("/{exercise_id}", response_model=ExerciseResponse)
 async def update_exercise(
     exercise_id: int,
     exercise_update: ExerciseUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Actualizar ejercicio (admin)"""
-    db_exercise = db.query(Exercise).filter(Exercise.id == exercise_id).first()
+    db_exercise = await db.get(Exercise, exercise_id)
     if not db_exercise:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -181,7 +381,10 @@ async def update_exercise(
     update_data = exercise_update.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_exercise, field, value)
+    db_exercise.change_seq = await db.scalar(next_change_seq())
     
-    db.commit()
-    db.refresh(db_exercise)
+    await db.commit()
+    await db.refresh(db_exercise)
+    await exercise_catalog.refresh(db)
+    await response_cache.invalidate("exercises", f"exercise:{exercise_id}")
     return db_exercise
\ No newline at end of file
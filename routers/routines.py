@@ -1,144 +1,340 @@
 """
 Router para gestión de rutinas
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy import case, delete, insert, inspect, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import Dict, List, Optional
 
-from database import get_db
+from database import get_async_db
 from models import (
-    Rutina, RutinaResponse, RutinaCreate, RutinaUpdate,
+    Rutina, RutinaResponse, RutinaSummary, RutinaCreate, RutinaUpdate, RutinaForkRequest,
     SerieEjercicio, SerieEjercicioCreate, SerieEjercicioUpdate, SerieEjercicioResponse,
-    User, Exercise, CategoriaRutinaEnum, NivelDificultadEnum
+    SerieEjercicioBatch,
+    Exercise, CategoriaRutinaEnum, NivelDificultadEnum, ListViewEnum
 )
 from routers.auth import get_current_active_user
+from principal_cache import Principal
+from loaders import loader_options, projection_options
+from projections import list_schema
+from search import apply_search
+from pagination import paginate_query, paginate_union
+from response_cache import response_cache
+from routine_summary import refresh_routine_summaries
+from http_cache import CACHE_POLICIES, compute_etag, conditional_response, json_response, render_json, row_version
 
 router = APIRouter()
 
+# Árboles de carga para serializar las respuestas sin lazy loads (N+1)
+RUTINA_LOAD_OPTIONS = loader_options(Rutina, RutinaResponse)
+SERIE_LOAD_OPTIONS = loader_options(SerieEjercicio, SerieEjercicioResponse)
+
+# Columnas que se copian al duplicar una rutina (el resto las fija la copia)
+RUTINA_COPY_COLUMNS = (
+    "descripcion", "categoria", "duracion_estimada", "nivel_dificultad",
+    "total_ejercicios", "total_series", "duracion_calculada", "grupos_musculares_csv"
+)
+SERIE_COPY_COLUMNS = (
+    "ejercicio_id", "orden", "series", "repeticiones_min", "repeticiones_max",
+    "peso", "tiempo_descanso", "notas"
+)
+
+async def _load_rutina(db: AsyncSession, rutina_id: int) -> Rutina:
+    """Recargar una rutina con todo el grafo de la respuesta"""
+    return (await db.scalars(
+        select(Rutina).options(*RUTINA_LOAD_OPTIONS).where(Rutina.id == rutina_id)
+        .execution_options(populate_existing=True)
+    )).one()
+
+def _rutina_version(rutina: Rutina) -> tuple:
+    """Versión de todo lo que se serializa de la rutina (sólo lo ya cargado)"""
+    unloaded = inspect(rutina).unloaded
+    rows = [rutina]
+    if "owner" not in unloaded and rutina.owner is not None:
+        rows.append(rutina.owner)
+    if "series" not in unloaded:
+        rows += [*rutina.series, *[serie.ejercicio for serie in rutina.series]]
+    return row_version(*rows)
+
+def _list_options(schema) -> tuple:
+    """Columnas y relaciones que necesita el esquema del listado (más la clave del cursor y el propietario)"""
+    return projection_options(Rutina, schema, "created_at", "owner_id")
+
+async def _load_serie(db: AsyncSession, serie_id: int) -> SerieEjercicio:
+    """Recargar una serie con su ejercicio"""
+    return (await db.scalars(
+        select(SerieEjercicio).options(*SERIE_LOAD_OPTIONS).where(SerieEjercicio.id == serie_id)
+        .execution_options(populate_existing=True)
+    )).one()
+
+async def _fork_rutinas(
+    db: AsyncSession, rutina_ids: List[int], owner_id: int, suffix: str, *conditions
+) -> Dict[int, int]:
+    """Copiar rutinas y sus series en tres sentencias, sea cual sea el número de rutinas (en PostgreSQL)
+
+    Las series se copian con INSERT ... SELECT, sin cargarlas. Devuelve
+    {id original: id de la copia} de las rutinas que existen y cumplen `conditions`.
+    """
+    orden = {rutina_id: posicion for posicion, rutina_id in enumerate(rutina_ids)}
+    originales = sorted((await db.execute(
+        select(Rutina.id, Rutina.nombre, *[getattr(Rutina, column) for column in RUTINA_COPY_COLUMNS])
+        .where(Rutina.id.in_(orden), *conditions)
+    )).all(), key=lambda original: orden[original.id])
+    if not originales:
+        return {}
+
+    # RETURNING en el orden de los parámetros: en PostgreSQL un solo INSERT por lotes
+    # (insertmanyvalues con centinela); SQLite no lo admite y hace un INSERT por fila
+    copias = (await db.scalars(
+        insert(Rutina.__table__).returning(Rutina.__table__.c.id, sort_by_parameter_order=True),
+        [
+            {
+                "nombre": original.nombre + suffix,
+                **{column: getattr(original, column) for column in RUTINA_COPY_COLUMNS},
+                "is_public": False, "is_template": False, "owner_id": owner_id
+            }
+            for original in originales
+        ]
+    )).all()
+    copia_de = {original.id: copia for original, copia in zip(originales, copias)}
+
+    await db.execute(
+        insert(SerieEjercicio).from_select(
+            ["rutina_id", *SERIE_COPY_COLUMNS],
+            select(
+                case(copia_de, value=SerieEjercicio.rutina_id),
+                *[getattr(SerieEjercicio, column) for column in SERIE_COPY_COLUMNS]
+            ).where(SerieEjercicio.rutina_id.in_(copia_de))
+        )
+    )
+    return copia_de
+
+async def _check_exercises_exist(db: AsyncSession, ejercicio_ids) -> None:
+    """400 con el primer id que no corresponde a ningún ejercicio"""
+    ejercicio_ids = set(ejercicio_ids)
+    if not ejercicio_ids:
+        return
+    found = set((await db.scalars(select(Exercise.id).where(Exercise.id.in_(ejercicio_ids)))).all())
+    missing = sorted(ejercicio_ids - found)
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Exercise with id {missing[0]} not found"
+        )
+
+async def _owned_serie(db: AsyncSession, rutina_id: int, serie_id: int, owner_id: int) -> tuple:
+    """Serie de una rutina del usuario y si la rutina es plantilla (404 si no existe o no es suya)"""
+    row = (await db.execute(select(SerieEjercicio, Rutina.is_template).join(Rutina).where(
+        SerieEjercicio.id == serie_id,
+        SerieEjercicio.rutina_id == rutina_id,
+        Rutina.owner_id == owner_id
+    ))).first()
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Exercise series not found"
+        )
+    return row
+
+def _rutina_tags(rutina_id: int, is_template: bool) -> tuple:
+    """Etiquetas de caché de una rutina; las plantillas también invalidan su listado"""
+    return (f"rutina:{rutina_id}", "templates") if is_template else (f"rutina:{rutina_id}",)
+
 @router.get("/", response_model=List[RutinaResponse])
 async def get_routines(
+    response: Response,
     categoria: Optional[CategoriaRutinaEnum] = None,
     nivel_dificultad: Optional[NivelDificultadEnum] = None,
     is_public: Optional[bool] = None,
     search: Optional[str] = None,
+    cursor: Optional[str] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=50),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    view: Optional[ListViewEnum] = None,
+    fields: Optional[str] = Query(None, description="Campos separados por comas, p. ej. nombre,categoria"),
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Obtener rutinas del usuario actual y públicas con filtros"""
-    query = db.query(Rutina).filter(
-        or_(
-            Rutina.owner_id == current_user.id,  # Rutinas del usuario
-            Rutina.is_public == True  # Rutinas públicas
+    """Obtener rutinas del usuario actual y públicas con filtros (más recientes primero)"""
+    if search and cursor:
+        # Los resultados de búsqueda van por relevancia, sin clave para el cursor
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="cursor cannot be combined with search; use skip and limit"
         )
-    )
+    schema = list_schema(RutinaResponse, RutinaSummary, view, fields)
+    query = select(Rutina).options(*_list_options(schema))
+    # Rutinas del usuario o públicas: cada rama tiene su índice
+    branches = [Rutina.owner_id == current_user.id, Rutina.is_public == True]
     
     # Filtros
     if categoria:
-        query = query.filter(Rutina.categoria == categoria.value)
+        query = query.where(Rutina.categoria == categoria.value)
     
     if nivel_dificultad:
-        query = query.filter(Rutina.nivel_dificultad == nivel_dificultad.value)
+        query = query.where(Rutina.nivel_dificultad == nivel_dificultad.value)
     
     if is_public is not None:
-        query = query.filter(Rutina.is_public == is_public)
+        query = query.where(Rutina.is_public == is_public)
     
     if search:
-        search_term = f"%{search.lower()}%"
-        query = query.filter(
-            or_(
-                Rutina.nombre.ilike(search_term),
-                Rutina.descripcion.ilike(search_term)
-            )
+        # Ordenado por relevancia: se pagina con skip/limit
+        query = apply_search(query.where(or_(*branches)), Rutina, search, db.bind.dialect.name)
+        rutinas = (await db.scalars(query.offset(skip).limit(limit))).all()
+    else:
+        rutinas = await paginate_union(
+            db, query, branches, [Rutina.created_at, Rutina.id], response,
+            cursor=cursor, skip=skip, limit=limit, descending=True
         )
-    
-    rutinas = query.offset(skip).limit(limit).all()
-    return rutinas
+    return json_response(List[schema], rutinas, response)
 
 @router.get("/mis-rutinas", response_model=List[RutinaResponse])
 async def get_my_routines(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=50),
+    view: Optional[ListViewEnum] = None,
+    fields: Optional[str] = None,
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Obtener solo las rutinas del usuario actual"""
-    rutinas = db.query(Rutina).filter(Rutina.owner_id == current_user.id).all()
-    return rutinas
+    """Obtener solo las rutinas del usuario actual (más recientes primero)"""
+    schema = list_schema(RutinaResponse, RutinaSummary, view, fields)
+    query = select(Rutina).options(*_list_options(schema)).where(
+        Rutina.owner_id == current_user.id
+    )
+    rutinas = await paginate_query(
+        db, query, [Rutina.created_at, Rutina.id], response,
+        cursor=cursor, skip=skip, limit=limit, descending=True
+    )
+    return json_response(List[schema], rutinas, response)
 
 @router.get("/categorias")
-async def get_routine_categories():
+async def get_routine_categories(request: Request):
     """Obtener categorías de rutinas disponibles"""
-    return {
-        "categorias": [categoria.value for categoria in CategoriaRutinaEnum]
-    }
+    async def build() -> Response:
+        return JSONResponse({
+            "categorias": [categoria.value for categoria in CategoriaRutinaEnum]
+        })
+    
+    return await response_cache.serve(request, [], build)
 
 @router.get("/plantillas", response_model=List[RutinaResponse])
 async def get_routine_templates(
+    request: Request,
+    response: Response,
     categoria: Optional[CategoriaRutinaEnum] = None,
     nivel_dificultad: Optional[NivelDificultadEnum] = None,
+    cursor: Optional[str] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=50),
-    db: Session = Depends(get_db)
+    view: Optional[ListViewEnum] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtener rutinas plantilla (predefinidas)"""
-    query = db.query(Rutina).filter(Rutina.is_template == True)
+    # Cada respuesta se etiqueta también con sus rutinas, propietarios y ejercicios (ver build)
+    tags = ["templates"]
     
-    if categoria:
-        query = query.filter(Rutina.categoria == categoria.value)
+    async def build() -> Response:
+        schema = list_schema(RutinaResponse, RutinaSummary, view, fields)
+        query = select(Rutina).options(*_list_options(schema)).where(Rutina.is_template == True)
+        
+        if categoria:
+            query = query.where(Rutina.categoria == categoria.value)
+        
+        if nivel_dificultad:
+            query = query.where(Rutina.nivel_dificultad == nivel_dificultad.value)
+        
+        plantillas = await paginate_query(
+            db, query, [Rutina.created_at, Rutina.id], response,
+            cursor=cursor, skip=skip, limit=limit
+        )
+        for plantilla in plantillas:
+            tags.extend((f"rutina:{plantilla.id}", f"user:{plantilla.owner_id}"))
+            if "series" in schema.model_fields:
+                # La vista completa incluye los ejercicios de cada serie
+                tags.extend(f"exercise:{serie.ejercicio_id}" for serie in plantilla.series)
+        
+        # Se evita serializar si el cliente ya tiene esta página
+        etag = compute_etag(
+            "routine_templates", sorted(request.query_params.multi_items()),
+            [_rutina_version(plantilla) for plantilla in plantillas]
+        )
+        return conditional_response(
+            request, etag, CACHE_POLICIES["routine_templates"],
+            lambda: render_json(List[schema], plantillas), response
+        )
     
-    if nivel_dificultad:
-        query = query.filter(Rutina.nivel_dificultad == nivel_dificultad.value)
+    return await response_cache.serve(request, tags, build)
+
+@router.post("/plantillas/copiar", response_model=List[RutinaResponse], status_code=status.HTTP_201_CREATED)
+async def fork_routine_templates(
+    fork: RutinaForkRequest,
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Copiar varias plantillas a las rutinas del usuario (todas o ninguna)"""
+    plantilla_ids = list(dict.fromkeys(fork.rutina_ids))
+    copia_de = await _fork_rutinas(db, plantilla_ids, current_user.id, "", Rutina.is_template == True)
+    for plantilla_id in plantilla_ids:
+        if plantilla_id not in copia_de:
+            # Sin commit: la sesión descarta las copias ya hechas
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Template with id {plantilla_id} not found"
+            )
     
-    plantillas = query.offset(skip).limit(limit).all()
-    return plantillas
+    await db.commit()
+    rutinas = (await db.scalars(
+        select(Rutina).options(*RUTINA_LOAD_OPTIONS).where(Rutina.id.in_(copia_de.values()))
+    )).all()
+    por_id = {rutina.id: rutina for rutina in rutinas}
+    return [por_id[copia_de[plantilla_id]] for plantilla_id in plantilla_ids]
 
 @router.post("/", response_model=RutinaResponse, status_code=status.HTTP_201_CREATED)
 async def create_routine(
     rutina: RutinaCreate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Crear nueva rutina"""
-    # Crear la rutina
+    # Verificar todos los ejercicios antes de escribir nada (una sola consulta)
+    await _check_exercises_exist(db, [serie_data.ejercicio_id for serie_data in rutina.series])
+    
+    # Rutina y series en una sola transacción
     rutina_data = rutina.dict(exclude={"series"})
     db_rutina = Rutina(**rutina_data, owner_id=current_user.id)
     
     db.add(db_rutina)
-    db.commit()
-    db.refresh(db_rutina)
-    
-    # Agregar series de ejercicios
-    for serie_data in rutina.series:
-        # Verificar que el ejercicio existe
-        ejercicio = db.query(Exercise).filter(Exercise.id == serie_data.ejercicio_id).first()
-        if not ejercicio:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Exercise with id {serie_data.ejercicio_id} not found"
-            )
-        
-        db_serie = SerieEjercicio(**serie_data.dict(), rutina_id=db_rutina.id)
-        db.add(db_serie)
-    
-    db.commit()
-    db.refresh(db_rutina)
-    return db_rutina
+    await db.flush()  # Único flush: id de la rutina
+    if rutina.series:
+        # Inserción masiva (executemany) de todas las series
+        await db.execute(insert(SerieEjercicio), [
+            {**serie_data.dict(), "rutina_id": db_rutina.id} for serie_data in rutina.series
+        ])
+        await refresh_routine_summaries(db, db_rutina.id)
+    await db.commit()
+    return await _load_rutina(db, db_rutina.id)
 
 @router.get("/{rutina_id}", response_model=RutinaResponse)
 async def get_routine(
     rutina_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtener una rutina específica"""
-    rutina = db.query(Rutina).filter(
+    rutina = await db.scalar(select(Rutina).options(*RUTINA_LOAD_OPTIONS).where(
         Rutina.id == rutina_id,
         or_(
             Rutina.owner_id == current_user.id,
             Rutina.is_public == True
         )
-    ).first()
+    ))
     
     if not rutina:
         raise HTTPException(
@@ -146,20 +342,24 @@ async def get_routine(
             detail="Routine not found"
         )
     
-    return rutina
+    etag = compute_etag("routine", _rutina_version(rutina))
+    return conditional_response(
+        request, etag, CACHE_POLICIES["routine_detail"],
+        lambda: render_json(RutinaResponse, rutina)
+    )
 
 @router.put("/{rutina_id}", response_model=RutinaResponse)
 async def update_routine(
     rutina_id: int,
     rutina_update: RutinaUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Actualizar rutina (solo el propietario)"""
-    db_rutina = db.query(Rutina).filter(
+    db_rutina = await db.scalar(select(Rutina).where(
         Rutina.id == rutina_id,
         Rutina.owner_id == current_user.id
-    ).first()
+    ))
     
     if not db_rutina:
         raise HTTPException(
@@ -171,21 +371,22 @@ async def update_routine(
     for field, value in update_data.items():
         setattr(db_rutina, field, value)
     
-    db.commit()
-    db.refresh(db_rutina)
-    return db_rutina
+    await db.commit()
+    await response_cache.invalidate(*_rutina_tags(rutina_id, db_rutina.is_template))
+    return await _load_rutina(db, db_rutina.id)
 
 @router.delete("/{rutina_id}")
 async def delete_routine(
     rutina_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Eliminar rutina (solo el propietario)"""
-    db_rutina = db.query(Rutina).filter(
+    # Las series se cargan con la rutina para el borrado en cascada (sin lazy loads)
+    db_rutina = await db.scalar(select(Rutina).options(selectinload(Rutina.series)).where(
         Rutina.id == rutina_id,
         Rutina.owner_id == current_user.id
-    ).first()
+    ))
     
     if not db_rutina:
         raise HTTPException(
@@ -193,81 +394,51 @@ async def delete_routine(
             detail="Routine not found"
         )
     
-    db.delete(db_rutina)
-    db.commit()
+    is_template = db_rutina.is_template
+    await db.delete(db_rutina)
+    await db.commit()
+    await response_cache.invalidate(*_rutina_tags(rutina_id, is_template))
     return {"message": "Routine deleted successfully"}
 
 @router.post("/{rutina_id}/duplicar", response_model=RutinaResponse)
 async def duplicate_routine(
     rutina_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Duplicar una rutina (crear copia personal)"""
-    # Buscar rutina original
-    rutina_original = db.query(Rutina).filter(
-        Rutina.id == rutina_id,
+    # Copia en la base de datos (INSERT ... SELECT) en una sola transacción
+    copia_de = await _fork_rutinas(
+        db, [rutina_id], current_user.id, " (Copia)",
         or_(
             Rutina.owner_id == current_user.id,
             Rutina.is_public == True
         )
-    ).first()
+    )
     
-    if not rutina_original:
+    if rutina_id not in copia_de:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Routine not found"
         )
     
-    # Crear nueva rutina
-    nueva_rutina = Rutina(
-        nombre=f"{rutina_original.nombre} (Copia)",
-        descripcion=rutina_original.descripcion,
-        categoria=rutina_original.categoria,
-        duracion_estimada=rutina_original.duracion_estimada,
-        nivel_dificultad=rutina_original.nivel_dificultad,
-        is_public=False,
-        is_template=False,
-        owner_id=current_user.id
-    )
-    
-    db.add(nueva_rutina)
-    db.commit()
-    db.refresh(nueva_rutina)
-    
-    # Copiar series de ejercicios
-    for serie_original in rutina_original.series:
-        nueva_serie = SerieEjercicio(
-            rutina_id=nueva_rutina.id,
-            ejercicio_id=serie_original.ejercicio_id,
-            orden=serie_original.orden,
-            series=serie_original.series,
-            repeticiones_min=serie_original.repeticiones_min,
-            repeticiones_max=serie_original.repeticiones_max,
-            peso=serie_original.peso,
-            tiempo_descanso=serie_original.tiempo_descanso,
-            notas=serie_original.notas
-        )
-        db.add(nueva_serie)
-    
-    db.commit()
-    db.refresh(nueva_rutina)
-    return nueva_rutina
+    await db.commit()
+    return await _load_rutina(db, copia_de[rutina_id])
 
 # Endpoints para gestión de series dentro de rutinas
 @router.post("/{rutina_id}/series", response_model=SerieEjercicioResponse)
 async def add_exercise_to_routine(
     rutina_id: int,
     serie: SerieEjercicioCreate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Agregar ejercicio a rutina"""
     # Verificar que la rutina existe y pertenece al usuario
-    rutina = db.query(Rutina).filter(
+    rutina = await db.scalar(select(Rutina).where(
         Rutina.id == rutina_id,
         Rutina.owner_id == current_user.id
-    ).first()
+    ))
     
     if not rutina:
         raise HTTPException(
@@ -276,7 +447,7 @@ async def add_exercise_to_routine(
         )
     
     # Verificar que el ejercicio existe
-    ejercicio = db.query(Exercise).filter(Exercise.id == serie.ejercicio_id).first()
+    ejercicio = await db.get(Exercise, serie.ejercicio_id)
     if not ejercicio:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -285,61 +456,119 @@ async def add_exercise_to_routine(
     
     db_serie = SerieEjercicio(**serie.dict(), rutina_id=rutina_id)
     db.add(db_serie)
-    db.commit()
-    db.refresh(db_serie)
-    return db_serie
+    await db.flush()
+    await refresh_routine_summaries(db, rutina_id)
+    await db.commit()
+    await response_cache.invalidate(*_rutina_tags(rutina_id, rutina.is_template))
+    return await _load_serie(db, db_serie.id)
+
+@router.patch("/{rutina_id}/series", response_model=List[SerieEjercicioResponse])
+async def batch_update_routine_series(
+    rutina_id: int,
+    batch: SerieEjercicioBatch,
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Reordenar, actualizar y quitar varias series a la vez; devuelve las series ordenadas"""
+    # Verificar permisos una sola vez
+    rutina = (await db.execute(select(Rutina.id, Rutina.is_template).where(
+        Rutina.id == rutina_id,
+        Rutina.owner_id == current_user.id
+    ))).first()
+    
+    if not rutina:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Routine not found"
+        )
+    
+    cambios = {item.id: item.dict(exclude_unset=True, exclude={"id"}) for item in batch.actualizar}
+    eliminar = set(batch.eliminar)
+    if len(cambios) != len(batch.actualizar) or cambios.keys() & eliminar:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Each series can appear only once in the batch"
+        )
+    
+    # Todas las series del lote deben ser de esta rutina
+    serie_ids = cambios.keys() | eliminar
+    if serie_ids:
+        encontradas = set((await db.scalars(select(SerieEjercicio.id).where(
+            SerieEjercicio.rutina_id == rutina_id,
+            SerieEjercicio.id.in_(serie_ids)
+        ))).all())
+        if encontradas != serie_ids:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Exercise series not found"
+            )
+    
+    if eliminar:
+        await db.execute(delete(SerieEjercicio).where(
+            SerieEjercicio.rutina_id == rutina_id,
+            SerieEjercicio.id.in_(eliminar)
+        ))
+    
+    # Un único UPDATE: cada columna modificada toma su valor por id con CASE
+    valores = {}
+    for field in {field for campos in cambios.values() for field in campos}:
+        por_id = {serie_id: campos[field] for serie_id, campos in cambios.items() if field in campos}
+        valores[field] = case(por_id, value=SerieEjercicio.id, else_=getattr(SerieEjercicio, field))
+    if valores:
+        await db.execute(
+            update(SerieEjercicio)
+            .where(SerieEjercicio.rutina_id == rutina_id, SerieEjercicio.id.in_(cambios.keys()))
+            .values(valores)
+            .execution_options(synchronize_session=False)
+        )
+    
+    if serie_ids:
+        await refresh_routine_summaries(db, rutina_id)
+    await db.commit()
+    await response_cache.invalidate(*_rutina_tags(rutina_id, rutina.is_template))
+    return (await db.scalars(
+        select(SerieEjercicio).options(*SERIE_LOAD_OPTIONS)
+        .where(SerieEjercicio.rutina_id == rutina_id)
+        .order_by(SerieEjercicio.orden, SerieEjercicio.id)
+        .execution_options(populate_existing=True)
+    )).all()
 
 @router.put("/{rutina_id}/series/{serie_id}", response_model=SerieEjercicioResponse)
 async def update_exercise_in_routine(
     rutina_id: int,
     serie_id: int,
     serie_update: SerieEjercicioUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Actualizar serie de ejercicio en rutina"""
     # Verificar permisos
-    serie = db.query(SerieEjercicio).join(Rutina).filter(
-        SerieEjercicio.id == serie_id,
-        SerieEjercicio.rutina_id == rutina_id,
-        Rutina.owner_id == current_user.id
-    ).first()
-    
-    if not serie:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Exercise series not found"
-        )
+    serie, is_template = await _owned_serie(db, rutina_id, serie_id, current_user.id)
     
     update_data = serie_update.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(serie, field, value)
     
-    db.commit()
-    db.refresh(serie)
-    return serie
+    await db.flush()
+    await refresh_routine_summaries(db, rutina_id)
+    await db.commit()
+    await response_cache.invalidate(*_rutina_tags(rutina_id, is_template))
+    return await _load_serie(db, serie.id)
 
 @router.delete("/{rutina_id}/series/{serie_id}")
 async def remove_exercise_from_routine(
     rutina_id: int,
     serie_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Remover ejercicio de rutina"""
     # Verificar permisos
-    serie = db.query(SerieEjercicio).join(Rutina).filter(
-        SerieEjercicio.id == serie_id,
-        SerieEjercicio.rutina_id == rutina_id,
-        Rutina.owner_id == current_user.id
-    ).first()
-    
-    if not serie:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Exercise series not found"
-        )
+    serie, is_template = await _owned_serie(db, rutina_id, serie_id, current_user.id)
     
-    db.delete(serie)
-    db.commit()
+    await db.delete(serie)
+    await db.flush()
+    await refresh_routine_summaries(db, rutina_id)
+    await db.commit()
+    await response_cache.invalidate(*_rutina_tags(rutina_id, is_template))
     return {"message": "Exercise removed from routine"}
\ No newline at end of file
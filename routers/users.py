@@ -2,35 +2,38 @@
 Router para gestión de usuarios
 """
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from database import get_db
+from database import get_async_db
 from models import User, UserUpdate, UserResponse
-from routers.auth import get_current_active_user
+from routers.auth import get_current_user_record
+from principal_cache import principal_cache
+from response_cache import response_cache
 
 router = APIRouter()
 
 @router.get("/profile", response_model=UserResponse)
-async def get_user_profile(current_user: User = Depends(get_current_active_user)):
+async def get_user_profile(current_user: User = Depends(get_current_user_record)):
     """Obtener perfil del usuario actual"""
     return current_user
 
 @router.put("/profile", response_model=UserResponse)
 async def update_user_profile(
     user_update: UserUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_record),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Actualizar perfil del usuario actual"""
     update_data = user_update.dict(exclude_unset=True)
     
     # Verificar si el email ya existe (si se está actualizando)
     if "email" in update_data:
-        existing_user = db.query(User).filter(
-            User.email == update_data["email"],
+        existing_user = await db.scalar(select(User).where(
+            func.lower(User.email) == update_data["email"].lower(),
             User.id != current_user.id
-        ).first()
+        ).limit(1))
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -39,10 +42,10 @@ async def update_user_profile(
     
     # Verificar si el username ya existe (si se está actualizando)
     if "username" in update_data:
-        existing_user = db.query(User).filter(
+        existing_user = await db.scalar(select(User).where(
             User.username == update_data["username"],
             User.id != current_user.id
-        ).first()
+        ).limit(1))
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -53,16 +56,23 @@ async def update_user_profile(
     for field, value in update_data.items():
         setattr(current_user, field, value)
     
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    await db.refresh(current_user)
+    principal_cache.invalidate_user(current_user.id)
+    await response_cache.invalidate(f"user:{current_user.id}")
     return current_user
 
 @router.delete("/profile")
 async def delete_user_account(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_record),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Eliminar cuenta del usuario actual"""
-    db.delete(current_user)
-    db.commit()
+    user_id = current_user.id
+    # Las relaciones se cargan antes: con AsyncSession no hay lazy loads al borrar
+    await db.refresh(current_user, ["rutinas", "ejercicios_favoritos"])
+    await db.delete(current_user)
+    await db.commit()
+    principal_cache.invalidate_user(user_id)
+    await response_cache.invalidate(f"user:{user_id}")
     return {"message": "Account deleted successfully"}
\ No newline at end of file
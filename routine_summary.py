@@ -0,0 +1,54 @@
+"""
+Resumen desnormalizado de cada rutina (nº de ejercicios distintos, series totales,
+grupos musculares y duración calculada) para las tarjetas de los listados
+
+Se recalcula con un único UPDATE agregado sobre las series de la rutina, dentro de
+la misma transacción que la escritura que lo cambia.
+"""
+from typing import Iterable, Optional
+
+from sqlalchemy import Integer, Update, cast, distinct, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Exercise, Rutina, SerieEjercicio
+
+# Estimación de la duración cuando la serie no indica repeticiones o descanso
+SEGUNDOS_POR_REPETICION = 4
+REPETICIONES_POR_DEFECTO = 10
+DESCANSO_POR_DEFECTO = 90  # segundos
+
+def _grupos_musculares(dialect: str):
+    """Grupos distintos separados por comas (el orden se normaliza al leerlos)"""
+    if dialect == "postgresql":
+        return func.string_agg(distinct(Exercise.grupo_muscular), ",")
+    return func.group_concat(distinct(Exercise.grupo_muscular))
+
+def summary_update(dialect: str, rutina_ids: Optional[Iterable[int]] = None) -> Update:
+    """UPDATE que recalcula el resumen de `rutina_ids` (o de todas las rutinas)"""
+    de_la_rutina = SerieEjercicio.rutina_id == Rutina.id
+    repeticiones = func.coalesce(
+        (SerieEjercicio.repeticiones_min + SerieEjercicio.repeticiones_max) / 2.0,
+        SerieEjercicio.repeticiones_max,
+        SerieEjercicio.repeticiones_min,
+        REPETICIONES_POR_DEFECTO
+    )
+    segundos = func.sum(SerieEjercicio.series * (
+        repeticiones * SEGUNDOS_POR_REPETICION
+        + func.coalesce(SerieEjercicio.tiempo_descanso, DESCANSO_POR_DEFECTO)
+    ))
+
+    statement = update(Rutina).values(
+        total_ejercicios=select(func.count(distinct(SerieEjercicio.ejercicio_id))).where(de_la_rutina).scalar_subquery(),
+        total_series=select(func.coalesce(func.sum(SerieEjercicio.series), 0)).where(de_la_rutina).scalar_subquery(),
+        duracion_calculada=select(cast(func.round(segundos / 60.0), Integer)).where(de_la_rutina).scalar_subquery(),
+        grupos_musculares_csv=select(_grupos_musculares(dialect)).select_from(SerieEjercicio).join(
+            Exercise, Exercise.id == SerieEjercicio.ejercicio_id
+        ).where(de_la_rutina).scalar_subquery(),
+    )
+    if rutina_ids is not None:
+        statement = statement.where(Rutina.id.in_(list(rutina_ids)))
+    return statement.execution_options(synchronize_session=False)
+
+async def refresh_routine_summaries(db: AsyncSession, *rutina_ids: int) -> None:
+    """Recalcular el resumen de las rutinas indicadas (sin commit)"""
+    await db.execute(summary_update(db.bind.dialect.name, rutina_ids))
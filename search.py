@@ -0,0 +1,189 @@
+"""
+Búsqueda de texto completo (insensible a acentos) para ejercicios y rutinas
+
+- PostgreSQL: tsvector con configuración española sin acentos (es_unaccent),
+  índice GIN sobre el documento e índice de trigramas sobre el nombre.
+- SQLite: tablas virtuales FTS5 (remove_diacritics) mantenidas por triggers.
+- Otros motores: ILIKE como antes, sin ranking.
+"""
+import re
+import unicodedata
+from typing import Dict, Tuple, Union
+
+from sqlalchemy import Select, column, func, literal_column, or_, table
+from sqlalchemy.engine import Connection, Engine
+
+# Campos indexados por tabla; el primero es el nombre (más peso en el ranking)
+SEARCH_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "exercises": ("nombre", "descripcion", "equipo_necesario"),
+    "rutinas": ("nombre", "descripcion"),
+}
+
+TS_CONFIG = "es_unaccent"
+
+def normalize(text: str) -> str:
+    """Minúsculas y sin acentos ("Elevación" -> "elevacion")"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+def _tokens(term: str):
+    return re.findall(r"\w+", normalize(term))
+
+# PostgreSQL
+
+def _pg_document(tablename: str, prefix: str = "") -> str:
+    """Expresión tsvector; debe coincidir con la del índice para que se use"""
+    nombre, *resto = SEARCH_FIELDS[tablename]
+    resto_sql = " || ' ' || ".join(f"coalesce({prefix}{field}, '')" for field in resto)
+    return (
+        f"setweight(to_tsvector('{TS_CONFIG}', coalesce({prefix}{nombre}, '')), 'A') || "
+        f"setweight(to_tsvector('{TS_CONFIG}', {resto_sql}), 'B')"
+    )
+
+def _pg_name(tablename: str, prefix: str = "") -> str:
+    return f"gainz_unaccent(lower({prefix}{SEARCH_FIELDS[tablename][0]}))"
+
+def postgres_search_indexes(concurrently: bool = False) -> Dict[str, str]:
+    """Nombre -> CREATE INDEX de los índices GIN de búsqueda (documento y trigramas del nombre)"""
+    create = "CREATE INDEX CONCURRENTLY IF NOT EXISTS" if concurrently else "CREATE INDEX IF NOT EXISTS"
+    indexes = {}
+    for tablename in SEARCH_FIELDS:
+        indexes[f"ix_{tablename}_search"] = (
+            f"{create} ix_{tablename}_search ON {tablename} USING GIN (({_pg_document(tablename)}))"
+        )
+        indexes[f"ix_{tablename}_nombre_trgm"] = (
+            f"{create} ix_{tablename}_nombre_trgm ON {tablename} USING GIN (({_pg_name(tablename)}) gin_trgm_ops)"
+        )
+    return indexes
+
+POSTGRES_SETUP = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # unaccent() no es IMMUTABLE; el envoltorio permite usarlo en índices
+    "CREATE OR REPLACE FUNCTION gainz_unaccent(text) RETURNS text AS "
+    "$$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$ "
+    "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT",
+    f"""
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{TS_CONFIG}') THEN
+            CREATE TEXT SEARCH CONFIGURATION {TS_CONFIG} (COPY = spanish);
+            ALTER TEXT SEARCH CONFIGURATION {TS_CONFIG}
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+        END IF;
+    END
+    $$
+    """,
+]
+
+def _postgres_search(query: Select, model, term: str) -> Select:
+    tablename = model.__tablename__
+    document = literal_column(_pg_document(tablename, f"{tablename}."))
+    name = literal_column(_pg_name(tablename, f"{tablename}."))
+    tsquery = func.websearch_to_tsquery(literal_column(f"'{TS_CONFIG}'::regconfig"), term)
+    pattern = f"%{normalize(term)}%"
+
+    rank = func.ts_rank(document, tsquery) + func.similarity(name, normalize(term))
+    return query.filter(
+        or_(document.op("@@")(tsquery), name.ilike(pattern))
+    ).order_by(rank.desc(), model.id)
+
+# SQLite
+
+def _sqlite_ddl(tablename: str) -> list:
+    fields = SEARCH_FIELDS[tablename]
+    fts = f"{tablename}_fts"
+    columns = ", ".join(fields)
+    new_values = ", ".join(f"new.{field}" for field in fields)
+    old_values = ", ".join(f"old.{field}" for field in fields)
+    delete_old = (
+        f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values});"
+    )
+    insert_new = f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({columns}, "
+        f"content='{tablename}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tablename} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tablename} BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {tablename} BEGIN {delete_old} {insert_new} END",
+    ]
+
+def _sqlite_search(query: Select, model, term: str) -> Select:
+    tablename = model.__tablename__
+    fts_name = f"{tablename}_fts"
+    fts = table(fts_name, column("rowid"))
+    # Cada palabra como prefijo: "eleva piern" -> "eleva"* "piern"*
+    match = " ".join(f'"{token}"*' for token in _tokens(term))
+    weights = ", ".join(["10.0"] + ["1.0"] * (len(SEARCH_FIELDS[tablename]) - 1))
+    rank = literal_column(f"bm25({fts_name}, {weights})")
+
+    return query.join(fts, fts.c.rowid == model.id).filter(
+        literal_column(fts_name).op("MATCH")(match)
+    ).order_by(rank, model.id)
+
+# API pública
+
+def ensure_search_indexes(bind: Union[Engine, Connection]) -> None:
+    """Crear (si no existen) los índices de búsqueda del motor en uso
+
+    Lo ejecuta la migración correspondiente; con un Engine abre su propia transacción.
+    """
+    if isinstance(bind, Engine):
+        with bind.begin() as connection:
+            return ensure_search_indexes(connection)
+
+    connection = bind
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        for statement in POSTGRES_SETUP + list(postgres_search_indexes().values()):
+            connection.exec_driver_sql(statement)
+    elif dialect == "sqlite":
+        for tablename in SEARCH_FIELDS:
+            exists = connection.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE name = ?", (f"{tablename}_fts",)
+            ).first()
+            for statement in _sqlite_ddl(tablename):
+                connection.exec_driver_sql(statement)
+            if not exists:
+                # Indexar las filas que ya existían antes de crear la tabla FTS
+                fts = f"{tablename}_fts"
+                connection.exec_driver_sql(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+def drop_search_indexes(connection: Connection) -> None:
+    """Deshacer ensure_search_indexes (las extensiones y la configuración se conservan)"""
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        for name in postgres_search_indexes():
+            connection.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+    elif dialect == "sqlite":
+        for tablename in SEARCH_FIELDS:
+            fts = f"{tablename}_fts"
+            for suffix in ("ai", "ad", "au"):
+                connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+            connection.exec_driver_sql(f"DROP TABLE IF EXISTS {fts}")
+
+def is_search_object(name: str) -> bool:
+    """Índices, tablas FTS5 (y sus tablas internas) creados por ensure_search_indexes
+
+    No están en los modelos, así que autogenerate debe ignorarlos (migrations/env.py).
+    """
+    return any(
+        name in (f"ix_{tablename}_search", f"ix_{tablename}_nombre_trgm", f"{tablename}_fts")
+        or name.startswith(f"{tablename}_fts_")
+        for tablename in SEARCH_FIELDS
+    )
+
+def apply_search(query: Select, model, term: str, dialect: str) -> Select:
+    """Filtrar `query` por `term` y ordenar por relevancia (`dialect`: motor de la sesión)"""
+    if not _tokens(term):
+        return query
+
+    if dialect == "postgresql":
+        return _postgres_search(query, model, term)
+    if dialect == "sqlite":
+        return _sqlite_search(query, model, term)
+
+    search_term = f"%{term.lower()}%"
+    return query.filter(
+        or_(*[getattr(model, field).ilike(search_term) for field in SEARCH_FIELDS[model.__tablename__]])
+    )
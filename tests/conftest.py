@@ -0,0 +1,83 @@
+"""
+Configuración común de los tests: SQLite temporal con las migraciones aplicadas
+
+DATABASE_URL se fija antes de importar la aplicación (database.py la lee al importarse).
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+_db_dir = tempfile.mkdtemp(prefix="gainz-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/test.db"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")  # Hash barato: los tests no miden bcrypt
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)  # main.py monta "images" con ruta relativa
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from database import SessionLocal, async_engine
+from migrate import upgrade_database
+from models import Exercise
+
+# Ejercicios mínimos para crear rutinas (ids 1..N)
+SEED_EXERCISES = 12
+
+@pytest.fixture(scope="session")
+def app():
+    upgrade_database()
+    db = SessionLocal()
+    try:
+        db.add_all(
+            Exercise(nombre=f"Ejercicio {n}", grupo_muscular="pectorales", nivel_dificultad="principiante")
+            for n in range(1, SEED_EXERCISES + 1)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+    import main
+    return main.app
+
+@pytest.fixture(scope="session")
+def client(app):
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture(scope="session")
+def auth_headers(client):
+    """Cabeceras de un usuario registrado para toda la sesión"""
+    client.post("/api/v1/auth/register", json={
+        "email": "tester@example.com", "username": "tester", "password": "secreto1"
+    })
+    response = client.post("/api/v1/auth/login", data={"username": "tester", "password": "secreto1"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+class StatementCounter:
+    """Sentencias SQL ejecutadas por el engine asíncrono (el de la API)"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+
+    def reset(self):
+        self.count = 0
+
+@pytest.fixture
+def statements(app):
+    counter = StatementCounter()
+    event.listen(async_engine.sync_engine, "before_cursor_execute", counter)
+    yield counter
+    event.remove(async_engine.sync_engine, "before_cursor_execute", counter)
+
+@pytest.fixture(autouse=True)
+def empty_response_cache():
+    """Cada test empieza sin respuestas cacheadas (los datos se siembran fuera de la API)"""
+    from response_cache import MemoryBackend, response_cache
+    response_cache.backend = MemoryBackend()
@@ -0,0 +1,69 @@
+"""
+Sync incremental del catálogo: /exercises/changes?since=&cursor=
+"""
+from sqlalchemy import func, select, update
+
+from database import SessionLocal
+from models import Exercise
+
+NEW_EXERCISE = {"nombre": "Remo", "grupo_muscular": "espalda", "nivel_dificultad": "intermedio"}
+
+def _current_version() -> int:
+    with SessionLocal() as db:
+        return db.scalar(select(func.max(Exercise.change_seq))) or 0
+
+def _sync(client, since, limit):
+    """Seguir next_cursor hasta el final; devuelve (ids vistos, versión final, páginas)"""
+    seen, pages, cursor = [], 0, None
+    while True:
+        params = {"since": since, "limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        body = client.get("/api/v1/exercises/changes", params=params).json()
+        pages += 1
+        seen += [change["id"] for change in body["changes"]]
+        if not body["has_more"]:
+            return seen, body["version"], pages
+        cursor = body["next_cursor"]
+
+def test_writes_get_distinct_increasing_sequences(client, auth_headers):
+    since = _current_version()
+    created = [
+        client.post("/api/v1/exercises/", json=dict(NEW_EXERCISE, nombre=f"Remo {n}"), headers=auth_headers).json()
+        for n in range(3)
+    ]
+    client.put(f"/api/v1/exercises/{created[0]['id']}", json={"descripcion": "Con barra"}, headers=auth_headers)
+
+    with SessionLocal() as db:
+        sequences = db.scalars(
+            select(Exercise.change_seq).where(Exercise.change_seq > since).order_by(Exercise.change_seq)
+        ).all()
+    assert sequences == [since + 2, since + 3, since + 4]  # El primero pasó de since + 1 a since + 4 al actualizarlo
+
+    seen, version, _ = _sync(client, since, limit=100)
+    assert sorted(seen) == sorted(exercise["id"] for exercise in created)
+    assert version == since + 4
+
+def test_pages_split_a_shared_sequence_without_losing_rows(client, auth_headers):
+    since = _current_version()
+    ids = [
+        client.post("/api/v1/exercises/", json=dict(NEW_EXERCISE, nombre=f"Jalón {n}"), headers=auth_headers).json()["id"]
+        for n in range(5)
+    ]
+    # Varias filas con la misma secuencia (como build_images.py en una imagen compartida)
+    with SessionLocal() as db:
+        db.execute(update(Exercise).where(Exercise.id.in_(ids)).values(change_seq=since + 5))
+        db.commit()
+
+    response = client.get("/api/v1/exercises/changes", params={"since": since, "limit": 2}).json()
+    assert response["has_more"]
+    assert response["version"] == since + 4  # La secuencia cortada (since + 5) aún no está completa
+
+    seen, version, pages = _sync(client, since, limit=2)
+    assert sorted(seen) == sorted(ids)
+    assert version == since + 5
+    assert pages == 3
+
+def test_invalid_cursor_is_rejected(client):
+    response = client.get("/api/v1/exercises/changes", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
@@ -0,0 +1,33 @@
+"""
+Favoritos: alta y baja en una sentencia, con los mismos códigos de error de siempre
+"""
+FAVORITE_URL = "/api/v1/exercises/favoritos/{}"
+
+def test_add_and_remove_favorite(client, auth_headers):
+    added = client.post(FAVORITE_URL.format(5), headers=auth_headers)
+    assert added.status_code == 200
+    assert added.json()["message"] == "Exercise added to favorites"
+
+    again = client.post(FAVORITE_URL.format(5), headers=auth_headers)
+    assert again.status_code == 400
+    assert again.json()["detail"] == "Exercise already in favorites"
+
+    removed = client.delete(FAVORITE_URL.format(5), headers=auth_headers)
+    assert removed.status_code == 200
+    assert removed.json()["total_favoritos"] == added.json()["total_favoritos"] - 1
+
+    again = client.delete(FAVORITE_URL.format(5), headers=auth_headers)
+    assert again.status_code == 400
+    assert again.json()["detail"] == "Exercise not in favorites"
+
+def test_unknown_exercise_is_not_found(client, auth_headers):
+    assert client.post(FAVORITE_URL.format(99999), headers=auth_headers).status_code == 404
+    assert client.delete(FAVORITE_URL.format(99999), headers=auth_headers).status_code == 404
+
+def test_toggle_writes_in_one_statement(client, auth_headers, statements):
+    client.get("/api/v1/auth/me", headers=auth_headers)  # Usuario ya en la caché de principales
+    statements.reset()
+    assert client.post(FAVORITE_URL.format(6), headers=auth_headers).status_code == 200
+    # INSERT ... RETURNING y el COUNT del total
+    assert statements.count == 2
+    client.delete(FAVORITE_URL.format(6), headers=auth_headers)
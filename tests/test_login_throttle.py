@@ -0,0 +1,100 @@
+"""
+Límite de intentos de login por IP frente a X-Forwarded-For falsificado
+"""
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+import routers.auth
+from throttle import LoginLimiter, LoginThrottle, client_ip, parse_networks
+
+def _request(peer: str, forwarded_for: str = None) -> Request:
+    headers = [(b"x-forwarded-for", forwarded_for.encode())] if forwarded_for else []
+    return Request({"type": "http", "client": (peer, 12345), "headers": headers})
+
+def test_forwarded_for_ignored_from_untrusted_peer():
+    trusted = parse_networks("10.0.0.0/8")
+    assert client_ip(_request("198.51.100.9", "1.2.3.4"), trusted) == "198.51.100.9"
+
+def test_rightmost_untrusted_hop_behind_proxy():
+    trusted = parse_networks("10.0.0.0/8")
+    # El cliente escribe lo que quiera a la izquierda; el proxy añade su IP real al final
+    for spoofed in ("1.2.3.4", "5.6.7.8, 9.9.9.9", "garbage"):
+        request = _request("10.0.0.5", f"{spoofed}, 203.0.113.7")
+        assert client_ip(request, trusted) == "203.0.113.7"
+    # Varios proxies de confianza encadenados
+    assert client_ip(_request("10.0.0.5", "1.2.3.4, 203.0.113.7, 10.0.0.9"), trusted) == "203.0.113.7"
+
+@pytest.fixture
+def tight_ip_limit(monkeypatch):
+    """Throttle nuevo con sólo 3 intentos por IP (y sin recarga durante el test)"""
+    throttle = LoginThrottle()
+    throttle.by_ip = LoginLimiter("ip", capacity=3, refill_seconds=3600, backoff_after=100)
+    monkeypatch.setattr(routers.auth, "login_throttle", throttle)
+    return throttle
+
+def _spoofed_logins(client, forwarded_for):
+    """3 fallos con usuarios distintos (sólo actúa el límite por IP) y un 4º intento"""
+    for attempt in range(3):
+        response = client.post(
+            "/api/v1/auth/login",
+            data={"username": f"nobody{attempt}", "password": "wrong"},
+            headers={"X-Forwarded-For": forwarded_for(attempt)},
+        )
+        assert response.status_code == 401
+    return client.post(
+        "/api/v1/auth/login",
+        data={"username": "nobody-else", "password": "wrong"},
+        headers={"X-Forwarded-For": forwarded_for(99)},
+    )
+
+def test_spoofed_forwarded_for_does_not_reset_ip_bucket(client, tight_ip_limit):
+    response = _spoofed_logins(client, lambda attempt: f"198.51.100.{attempt}")
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+
+def test_spoofed_forwarded_for_behind_trusted_proxy(app, client, tight_ip_limit, monkeypatch):
+    trusted = parse_networks("10.0.0.0/8")
+    monkeypatch.setattr(routers.auth, "client_ip", lambda request: client_ip(request, trusted))
+
+    async def via_proxy(scope, receive, send):
+        # La conexión llega del proxy, que añade la IP real al final de X-Forwarded-For
+        scope = dict(scope, client=("10.0.0.5", 40000))
+        headers = [(name, value) for name, value in scope["headers"] if name != b"x-forwarded-for"]
+        spoofed = dict(scope["headers"]).get(b"x-forwarded-for", b"")
+        headers.append((b"x-forwarded-for", spoofed + b", 203.0.113.7"))
+        await app(dict(scope, headers=headers), receive, send)
+
+    response = _spoofed_logins(TestClient(via_proxy), lambda attempt: f"198.51.100.{attempt}")
+    assert response.status_code == 429
+    assert tight_ip_limit.by_ip._entries.keys() == {"203.0.113.7"}
+
+def test_unconfigured_internal_proxy_is_not_an_ip_key():
+    trusted = parse_networks("127.0.0.1")
+    # Render sin TRUSTED_PROXIES: la conexión llega del proxy interno, compartido por todos
+    assert client_ip(_request("10.0.0.5", "203.0.113.7"), trusted) is None
+    # Sin X-Forwarded-For es una conexión directa (red local, desarrollo)
+    assert client_ip(_request("10.0.0.5"), trusted) == "10.0.0.5"
+    # Una IP pública no puede hacerse pasar por proxy para saltarse el límite
+    assert client_ip(_request("198.51.100.9", "203.0.113.7"), trusted) == "198.51.100.9"
+
+def test_unknown_ip_is_throttled_by_username_only():
+    throttle = LoginThrottle()
+    throttle.by_username = LoginLimiter("username", capacity=2, refill_seconds=3600, backoff_after=100)
+    for _ in range(2):
+        assert throttle.check("alguien", None) is None
+        throttle.failure("alguien", None)
+    assert throttle.check("alguien", None) is not None
+    assert not throttle.by_ip._entries
+
+def test_username_rejections_do_not_drain_ip_budget():
+    throttle = LoginThrottle()
+    throttle.by_username = LoginLimiter("username", capacity=1, refill_seconds=3600, backoff_after=100)
+    throttle.by_ip = LoginLimiter("ip", capacity=3, refill_seconds=3600, backoff_after=100)
+
+    assert throttle.check("victima", "198.51.100.9") is None
+    # El usuario ya no tiene cupo: rechazado sin gastar intentos de la IP
+    for _ in range(10):
+        assert throttle.check("victima", "198.51.100.9") is not None
+    assert throttle.check("otro", "198.51.100.9") is None
+    assert throttle.check("otro2", "198.51.100.9") is None
@@ -0,0 +1,11 @@
+"""
+Las migraciones dejan el esquema igual que los modelos
+"""
+from alembic import command
+
+from migrate import alembic_config
+
+def test_autogenerate_has_no_pending_operations(app):
+    # Falla (AutoGenerateDiffsDetected) si un modelo cambió sin su migración; los
+    # objetos de búsqueda (FTS5, índices GIN) se excluyen en migrations/env.py
+    command.check(alembic_config())
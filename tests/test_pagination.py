@@ -0,0 +1,39 @@
+"""
+Paginación por cursor: fechas con zona horaria y combinación con search
+"""
+from datetime import datetime, timedelta, timezone
+
+from pagination import encode_cursor
+
+def test_catalog_cursor_accepts_timezone_offsets(client):
+    first = client.get("/api/v1/exercises/", params={"limit": 3})
+    expected = client.get("/api/v1/exercises/", params={"limit": 3, "cursor": first.headers["X-Next-Cursor"]})
+    last = first.json()[-1]
+
+    # El mismo instante escrito con otra zona (o sin ella) da la misma página
+    created_at = datetime.fromisoformat(last["created_at"])
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    for value in (created_at.astimezone(timezone(timedelta(hours=2))), created_at.replace(tzinfo=None)):
+        page = client.get("/api/v1/exercises/", params={"limit": 3, "cursor": encode_cursor([value, last["id"]])})
+        assert page.status_code == 200
+        assert [item["id"] for item in page.json()] == [item["id"] for item in expected.json()]
+
+def test_catalog_cursor_with_wrong_types_is_rejected(client):
+    response = client.get("/api/v1/exercises/", params={"cursor": encode_cursor(["2026-01-01T00:00:00", None])})
+    assert response.status_code == 400
+
+def test_search_with_cursor_is_rejected(client, auth_headers):
+    cursor = client.get("/api/v1/exercises/", params={"limit": 1}).headers["X-Next-Cursor"]
+
+    exercises = client.get("/api/v1/exercises/", params={"search": "ejercicio", "cursor": cursor})
+    routines = client.get(
+        "/api/v1/routines/", params={"search": "rutina", "cursor": cursor}, headers=auth_headers
+    )
+    assert exercises.status_code == 400
+    assert routines.status_code == 400
+
+def test_search_pages_without_next_cursor(client):
+    response = client.get("/api/v1/exercises/", params={"search": "ejercicio", "limit": 1})
+    assert response.status_code == 200
+    assert "X-Next-Cursor" not in response.headers
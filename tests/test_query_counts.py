@@ -0,0 +1,172 @@
+"""
+Número de sentencias SQL por endpoint: no debe crecer con el tamaño de la página
+ni con el número de rutinas o series (sin N+1)
+"""
+import pytest
+from sqlalchemy import select
+
+from conftest import SEED_EXERCISES
+from database import SessionLocal, async_engine
+from models import Rutina, SerieEjercicio, User
+from routine_summary import summary_update
+
+PAGE = 10
+SERIES_PER_ROUTINE = 3
+
+def _template_exercise(n: int, orden: int) -> int:
+    """Ejercicios distintos en cada plantilla (para comprobar que cada copia lleva los suyos)"""
+    return (n + orden) % SEED_EXERCISES + 1
+
+@pytest.fixture(scope="module")
+def templates(client, auth_headers):
+    """PAGE plantillas públicas con sus series (del usuario de los tests)"""
+    with SessionLocal() as db:
+        owner_id = db.scalar(select(User.id).where(User.username == "tester"))
+        rutinas = [
+            Rutina(
+                nombre=f"Plantilla {n}", categoria="fuerza", is_public=True, is_template=True,
+                owner_id=owner_id,
+                series=[
+                    SerieEjercicio(ejercicio_id=_template_exercise(n, orden), orden=orden, series=3)
+                    for orden in range(1, SERIES_PER_ROUTINE + 1)
+                ]
+            )
+            for n in range(PAGE)
+        ]
+        db.add_all(rutinas)
+        db.commit()
+        db.execute(summary_update(db.bind.dialect.name))
+        db.commit()
+        return [rutina.id for rutina in rutinas]
+
+def _count(statements, request):
+    statements.reset()
+    response = request()
+    assert response.status_code < 300, response.text
+    return statements.count, response
+
+@pytest.mark.parametrize("path", ["/api/v1/routines/plantillas", "/api/v1/routines/", "/api/v1/routines/mis-rutinas"])
+def test_list_statements_do_not_depend_on_page_size(client, auth_headers, templates, statements, path):
+    client.get(path, headers=auth_headers)  # Calentar la caché del usuario autenticado
+    one, response = _count(statements, lambda: client.get(path, params={"limit": 1}, headers=auth_headers))
+    assert len(response.json()) == 1
+    many, response = _count(statements, lambda: client.get(path, params={"limit": PAGE}, headers=auth_headers))
+    assert len(response.json()) == PAGE
+    assert all(len(rutina["series"]) == SERIES_PER_ROUTINE for rutina in response.json())
+    assert one == many
+
+def test_routine_detail_statements_do_not_depend_on_series(client, auth_headers, templates, statements):
+    client.get("/api/v1/users/profile", headers=auth_headers)
+    counts = []
+    for total in (1, PAGE):
+        rutina = client.post("/api/v1/routines/", headers=auth_headers, json={
+            "nombre": f"Detalle {total}", "categoria": "fuerza",
+            "series": [{"ejercicio_id": orden, "orden": orden, "series": 3} for orden in range(1, total + 1)]
+        }).json()
+        count, response = _count(statements, lambda: client.get(f"/api/v1/routines/{rutina['id']}", headers=auth_headers))
+        assert len(response.json()["series"]) == total
+        counts.append(count)
+    assert counts[0] == counts[1]
+
+def test_fork_statements_do_not_depend_on_template_count(client, auth_headers, templates, statements):
+    client.get("/api/v1/users/profile", headers=auth_headers)
+    fork = lambda ids: client.post("/api/v1/routines/plantillas/copiar", json={"rutina_ids": ids}, headers=auth_headers)
+
+    one, response = _count(statements, lambda: fork(templates[:1]))
+    assert len(response.json()) == 1
+    many, response = _count(statements, lambda: fork(templates))
+    copias = response.json()
+    assert [copia["nombre"] for copia in copias] == [f"Plantilla {n}" for n in range(PAGE)]
+    for n, copia in enumerate(copias):
+        assert not copia["is_template"]
+        assert [serie["ejercicio_id"] for serie in copia["series"]] == [
+            _template_exercise(n, orden) for orden in range(1, SERIES_PER_ROUTINE + 1)
+        ]
+    # Las rutinas se insertan con RETURNING ordenado: en PostgreSQL un solo INSERT por lotes,
+    # SQLite no lo admite y hace uno por rutina. Las series van siempre en un INSERT ... SELECT
+    per_template = 1 if async_engine.dialect.name == "sqlite" else 0
+    assert many - one == per_template * (PAGE - 1)
+
+def test_fork_copies_the_series_of_each_template(client, auth_headers, templates):
+    """Cada copia con las series de su original, en cualquier orden de petición"""
+    ids = templates[::-1][::2] + templates[::-1][1::2]
+    response = client.post("/api/v1/routines/plantillas/copiar", json={"rutina_ids": ids}, headers=auth_headers)
+    assert response.status_code == 201
+    for copia in response.json():
+        n = int(copia["nombre"].removeprefix("Plantilla "))
+        assert [serie["ejercicio_id"] for serie in copia["series"]] == [
+            _template_exercise(n, orden) for orden in range(1, SERIES_PER_ROUTINE + 1)
+        ]
+
+def test_fork_unknown_template_copies_nothing(client, auth_headers, templates):
+    mias = lambda: client.get("/api/v1/routines/mis-rutinas", params={"limit": 50}, headers=auth_headers).json()
+    antes = len(mias())
+    response = client.post(
+        "/api/v1/routines/plantillas/copiar", json={"rutina_ids": [templates[0], 999999]}, headers=auth_headers
+    )
+    assert response.status_code == 404
+    assert len(mias()) == antes
+
+def test_duplicate_statements_do_not_depend_on_series(client, auth_headers, templates, statements):
+    client.get("/api/v1/users/profile", headers=auth_headers)
+    counts = []
+    for total in (1, PAGE):
+        rutina = client.post("/api/v1/routines/", headers=auth_headers, json={
+            "nombre": f"Original {total}", "categoria": "fuerza",
+            "series": [{"ejercicio_id": orden, "orden": orden, "series": 3} for orden in range(1, total + 1)]
+        }).json()
+        count, response = _count(statements, lambda: client.post(f"/api/v1/routines/{rutina['id']}/duplicar", headers=auth_headers))
+        copia = response.json()
+        assert copia["nombre"] == f"Original {total} (Copia)"
+        assert len(copia["series"]) == total and copia["total_series"] == 3 * total
+        counts.append(count)
+    assert counts[0] == counts[1]
+
+def _new_routine(client, auth_headers, total):
+    return client.post("/api/v1/routines/", headers=auth_headers, json={
+        "nombre": f"Rutina de {total}", "categoria": "fuerza",
+        "series": [{"ejercicio_id": orden, "orden": orden, "series": 3} for orden in range(1, total + 1)]
+    })
+
+def test_create_statements_do_not_depend_on_series(client, auth_headers, statements):
+    client.get("/api/v1/users/profile", headers=auth_headers)
+    counts = []
+    for total in (1, SEED_EXERCISES):
+        count, response = _count(statements, lambda: _new_routine(client, auth_headers, total))
+        rutina = response.json()
+        assert len(rutina["series"]) == total and rutina["total_ejercicios"] == total
+        counts.append(count)
+    assert counts[0] == counts[1]
+
+def test_create_with_unknown_exercise_writes_nothing(client, auth_headers):
+    mias = lambda: client.get("/api/v1/routines/mis-rutinas", params={"limit": 50}, headers=auth_headers).json()
+    antes = len(mias())
+    response = client.post("/api/v1/routines/", headers=auth_headers, json={
+        "nombre": "Rota", "categoria": "fuerza",
+        "series": [{"ejercicio_id": 1, "orden": 1, "series": 3}, {"ejercicio_id": 999999, "orden": 2, "series": 3}]
+    })
+    assert response.status_code == 400
+    assert len(mias()) == antes
+
+def test_batch_series_statements_do_not_depend_on_batch_size(client, auth_headers, statements):
+    client.get("/api/v1/users/profile", headers=auth_headers)
+    counts = []
+    for total in (2, SEED_EXERCISES):
+        rutina = _new_routine(client, auth_headers, total).json()
+        series = rutina["series"]
+        # Invertir el orden y cambiar las repeticiones de todas menos una, que se quita
+        batch = {
+            "actualizar": [
+                {"id": serie["id"], "orden": total - serie["orden"], "repeticiones_min": 8}
+                for serie in series[1:]
+            ],
+            "eliminar": [series[0]["id"]],
+        }
+        count, response = _count(statements, lambda: client.patch(
+            f"/api/v1/routines/{rutina['id']}/series", json=batch, headers=auth_headers
+        ))
+        resultado = response.json()
+        assert [serie["id"] for serie in resultado] == [serie["id"] for serie in reversed(series[1:])]
+        assert all(serie["repeticiones_min"] == 8 for serie in resultado)
+        counts.append(count)
+    assert counts[0] == counts[1]
@@ -0,0 +1,30 @@
+"""
+/auth/refresh-token: rotación con body y forma antigua con el token de acceso
+"""
+REFRESH_URL = "/api/v1/auth/refresh-token"
+
+def test_rotation_with_body(client, auth_headers):
+    first = client.post(REFRESH_URL, headers=auth_headers).json()
+
+    rotated = client.post(REFRESH_URL, json={"refresh_token": first["refresh_token"]})
+    assert rotated.status_code == 200
+    assert "Deprecation" not in rotated.headers
+    # El refresh token ya rotado no vuelve a valer
+    assert client.post(REFRESH_URL, json={"refresh_token": first["refresh_token"]}).status_code == 401
+
+def test_legacy_bearer_form_issues_first_refresh_token(client, auth_headers):
+    response = client.post(REFRESH_URL, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["Deprecation"] == "true"
+    tokens = response.json()
+    assert tokens["refresh_token"]
+
+    me = client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {tokens['access_token']}"})
+    assert me.status_code == 200
+    assert client.post(REFRESH_URL, json={"refresh_token": tokens["refresh_token"]}).status_code == 200
+
+def test_legacy_form_requires_a_valid_access_token(client, auth_headers):
+    assert client.post(REFRESH_URL).status_code == 401
+    refresh_token = client.post(REFRESH_URL, headers=auth_headers).json()["refresh_token"]
+    # Un refresh token no vale como token de acceso
+    assert client.post(REFRESH_URL, headers={"Authorization": f"Bearer {refresh_token}"}).status_code == 401
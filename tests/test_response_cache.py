@@ -0,0 +1,145 @@
+"""
+Caché de respuestas: serve/invalidate con los dos backends e invalidación de plantillas
+"""
+import asyncio
+
+import pytest
+from fastapi import Response
+from sqlalchemy import select
+from starlette.requests import Request
+
+from database import SessionLocal
+from models import Rutina, User
+from response_cache import MemoryBackend, RedisBackend, ResponseCache
+
+class FakeRedis:
+    """Lo justo de redis.asyncio.Redis que usa RedisBackend, en memoria (sin caducidad)"""
+
+    def __init__(self):
+        self.values = {}
+        self.sets = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def smembers(self, key):
+        return set(self.sets.get(key, ()))
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+            self.sets.pop(key, None)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def set(self, key, value, ex=None):
+        self.commands.append(lambda: self.client.values.__setitem__(key, value))
+
+    def sadd(self, key, member):
+        self.commands.append(lambda: self.client.sets.setdefault(key, set()).add(member))
+
+    def expire(self, key, ttl):
+        pass
+
+    async def execute(self):
+        for command in self.commands:
+            command()
+
+@pytest.fixture(params=["memory", "redis"])
+def cache(request):
+    backend = MemoryBackend() if request.param == "memory" else RedisBackend(FakeRedis())
+    return ResponseCache(backend, ttl=60)
+
+def _request(path: str, query: str = "", etag: str = None) -> Request:
+    headers = [(b"if-none-match", etag.encode())] if etag else []
+    return Request({"type": "http", "method": "GET", "path": path, "query_string": query.encode(), "headers": headers})
+
+class Builder:
+    """build() de un endpoint: cuenta las llamadas y puede añadir etiquetas al construir"""
+
+    def __init__(self, body=b"[]", status_code=200, tags=None, extra_tags=()):
+        self.calls = 0
+        self.body = body
+        self.status_code = status_code
+        self.tags = tags if tags is not None else []
+        self.extra_tags = extra_tags
+
+    async def __call__(self) -> Response:
+        self.calls += 1
+        self.tags.extend(self.extra_tags)
+        return Response(
+            content=self.body, status_code=self.status_code, media_type="application/json",
+            headers={"ETag": '"v1"', "Cache-Control": "public, max-age=60"}
+        )
+
+def test_serve_stores_and_replays_responses(cache):
+    build = Builder(body=b'[{"id": 1}]')
+
+    first = asyncio.run(cache.serve(_request("/items", "b=2&a=1"), ["items"], build))
+    # Mismos parámetros en otro orden: misma entrada
+    second = asyncio.run(cache.serve(_request("/items", "a=1&b=2"), ["items"], build))
+
+    assert build.calls == 1
+    assert second.body == first.body == b'[{"id": 1}]'
+    assert second.headers["etag"] == '"v1"'
+    assert second.headers["cache-control"] == "public, max-age=60"
+
+def test_cached_entry_answers_conditional_requests(cache):
+    build = Builder()
+    asyncio.run(cache.serve(_request("/items"), ["items"], build))
+
+    response = asyncio.run(cache.serve(_request("/items", etag='"v1"'), ["items"], build))
+    assert response.status_code == 304
+    assert build.calls == 1
+
+def test_only_ok_responses_are_stored(cache):
+    build = Builder(status_code=404)
+    asyncio.run(cache.serve(_request("/items/9"), ["items"], build))
+    asyncio.run(cache.serve(_request("/items/9"), ["items"], build))
+    assert build.calls == 2
+
+def test_invalidate_drops_only_tagged_entries(cache):
+    items, users = Builder(), Builder()
+    asyncio.run(cache.serve(_request("/items"), ["items"], items))
+    asyncio.run(cache.serve(_request("/users"), ["users"], users))
+
+    asyncio.run(cache.invalidate("items", "unknown"))
+    asyncio.run(cache.serve(_request("/items"), ["items"], items))
+    asyncio.run(cache.serve(_request("/users"), ["users"], users))
+    assert (items.calls, users.calls) == (2, 1)
+
+def test_tags_added_during_build_are_indexed(cache):
+    tags = ["templates"]
+    build = Builder(tags=tags, extra_tags=["rutina:7"])
+    asyncio.run(cache.serve(_request("/plantillas"), tags, build))
+
+    asyncio.run(cache.invalidate("rutina:7"))
+    asyncio.run(cache.serve(_request("/plantillas"), tags, build))
+    assert build.calls == 2
+
+def test_template_update_invalidates_pages_it_was_not_on(client, auth_headers):
+    with SessionLocal() as db:
+        owner_id = db.scalar(select(User.id).where(User.username == "tester"))
+        plantilla = Rutina(
+            nombre="Plantilla movida", categoria="fuerza", nivel_dificultad="avanzado",
+            is_public=True, is_template=True, owner_id=owner_id
+        )
+        db.add(plantilla)
+        db.commit()
+        plantilla_id = plantilla.id
+
+    params = {"categoria": "funcional", "nivel_dificultad": "avanzado"}
+    before = client.get("/api/v1/routines/plantillas", params=params)
+    assert plantilla_id not in [rutina["id"] for rutina in before.json()]
+
+    update = client.put(f"/api/v1/routines/{plantilla_id}", json={"categoria": "funcional"}, headers=auth_headers)
+    assert update.status_code == 200
+
+    after = client.get("/api/v1/routines/plantillas", params=params)
+    assert plantilla_id in [rutina["id"] for rutina in after.json()]
@@ -0,0 +1,22 @@
+"""
+Resumen desnormalizado de las rutinas
+"""
+
+def test_repeated_exercise_counts_once(client, auth_headers):
+    response = client.post("/api/v1/routines/", headers=auth_headers, json={
+        "nombre": "Pirámide", "categoria": "fuerza",
+        "series": [
+            {"ejercicio_id": 1, "orden": 1, "series": 3},
+            {"ejercicio_id": 2, "orden": 2, "series": 3},
+            {"ejercicio_id": 1, "orden": 3, "series": 2},
+        ]
+    })
+    assert response.status_code == 201, response.text
+    rutina = response.json()
+    assert rutina["total_ejercicios"] == 2
+    assert rutina["total_series"] == 8
+
+    serie = next(serie for serie in rutina["series"] if serie["orden"] == 3)
+    client.delete(f"/api/v1/routines/{rutina['id']}/series/{serie['id']}", headers=auth_headers)
+    rutina = client.get(f"/api/v1/routines/{rutina['id']}", headers=auth_headers).json()
+    assert (rutina["total_ejercicios"], rutina["total_series"]) == (2, 6)
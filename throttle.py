@@ -0,0 +1,219 @@
+"""
+Limitación adaptativa de intentos de login (por usuario y por IP)
+
+Cada clave tiene un token bucket y, tras varios fallos seguidos, un bloqueo con
+backoff exponencial. Se comprueba antes de verificar la contraseña, de modo que
+una ráfaga de intentos no consume CPU de bcrypt.
+"""
+import ipaddress
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from fastapi import Request
+
+from metrics import registry
+
+# Por usuario: pocos intentos, se recupera uno cada LOGIN_USER_REFILL_SECONDS
+LOGIN_USER_CAPACITY = int(os.getenv("LOGIN_USER_CAPACITY", "5"))
+LOGIN_USER_REFILL_SECONDS = float(os.getenv("LOGIN_USER_REFILL_SECONDS", "12"))
+# Por IP: más margen (NAT, redes compartidas)
+LOGIN_IP_CAPACITY = int(os.getenv("LOGIN_IP_CAPACITY", "20"))
+LOGIN_IP_REFILL_SECONDS = float(os.getenv("LOGIN_IP_REFILL_SECONDS", "3"))
+# Backoff: a partir de N fallos seguidos, bloqueo de base * 2^(fallos - N) segundos
+LOGIN_USER_BACKOFF_AFTER = int(os.getenv("LOGIN_USER_BACKOFF_AFTER", "3"))
+LOGIN_IP_BACKOFF_AFTER = int(os.getenv("LOGIN_IP_BACKOFF_AFTER", "20"))
+LOGIN_BACKOFF_BASE_SECONDS = float(os.getenv("LOGIN_BACKOFF_BASE_SECONDS", "1"))
+LOGIN_BACKOFF_MAX_SECONDS = float(os.getenv("LOGIN_BACKOFF_MAX_SECONDS", "900"))
+LOGIN_THROTTLE_MAX_KEYS = int(os.getenv("LOGIN_THROTTLE_MAX_KEYS", "100000"))
+# Proxies de confianza (IPs o rangos CIDR): sólo su X-Forwarded-For se tiene en cuenta.
+# En producción hay que poner el rango del proxy de la plataforma (ver DEPLOY.md)
+TRUSTED_PROXIES = os.getenv("TRUSTED_PROXIES", "127.0.0.1,::1")
+
+Network = ipaddress.IPv4Network | ipaddress.IPv6Network
+
+def parse_networks(value: str) -> Tuple[Network, ...]:
+    """"10.0.0.0/8, 127.0.0.1" -> redes (una IP suelta es una red /32 o /128)"""
+    return tuple(ipaddress.ip_network(item.strip(), strict=False) for item in value.split(",") if item.strip())
+
+TRUSTED_NETWORKS = parse_networks(TRUSTED_PROXIES)
+# Redes privadas y locales: de ahí sólo llegan los proxies de la plataforma (o desarrollo)
+INTERNAL_NETWORKS = parse_networks(
+    "10.0.0.0/8,172.16.0.0/12,192.168.0.0/16,100.64.0.0/10,127.0.0.0/8,::1,fc00::/7,fe80::/10"
+)
+
+def _in_networks(address: str, networks: Tuple[Network, ...]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+_warned_untrusted_proxy = False
+
+def client_ip(request: Request, trusted: Tuple[Network, ...] = TRUSTED_NETWORKS) -> Optional[str]:
+    """IP del cliente para la limitación: el salto más a la derecha que no es un proxy de confianza
+
+    X-Forwarded-For sólo cuenta si la conexión llega de un proxy de confianza, y se
+    recorre de derecha a izquierda: cada proxy añade al final la IP que le llegó,
+    mientras que lo de la izquierda lo escribe el propio cliente.
+
+    None si la conexión llega con X-Forwarded-For desde una dirección interna que no
+    está en TRUSTED_PROXIES: es un proxy sin configurar, y su IP la comparten todos
+    los clientes, así que no sirve como clave (sólo se limita por usuario).
+    """
+    global _warned_untrusted_proxy
+    peer = request.client.host if request.client else "unknown"
+    hops = [
+        hop.strip()
+        for header in request.headers.getlist("x-forwarded-for")
+        for hop in header.split(",")
+        if hop.strip()
+    ]
+    if not _in_networks(peer, trusted):
+        if hops and _in_networks(peer, INTERNAL_NETWORKS):
+            if not _warned_untrusted_proxy:
+                _warned_untrusted_proxy = True
+                print(f"⚠️  Login desde el proxy {peer}, que no está en TRUSTED_PROXIES: sin límite por IP")
+            return None
+        return peer
+    for hop in reversed(hops):
+        if not _in_networks(hop, trusted):
+            return hop
+    return hops[0] if hops else peer
+
+class _Entry:
+    __slots__ = ("tokens", "updated_at", "failures", "blocked_until")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated_at = now
+        self.failures = 0
+        self.blocked_until = 0.0
+
+class LoginLimiter:
+    """Token bucket + backoff exponencial por clave, en un LRU acotado"""
+
+    def __init__(
+        self,
+        scope: str,
+        capacity: int,
+        refill_seconds: float,
+        backoff_after: int,
+        max_keys: int = LOGIN_THROTTLE_MAX_KEYS
+    ):
+        self.scope = scope
+        self.capacity = capacity
+        self.refill_seconds = refill_seconds
+        self.backoff_after = backoff_after
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    def _entry(self, key: str, now: float) -> _Entry:
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _Entry(self.capacity, now)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(key)
+            elapsed = now - entry.updated_at
+            entry.tokens = min(self.capacity, entry.tokens + elapsed / self.refill_seconds)
+            entry.updated_at = now
+        return entry
+
+    def _wait(self, entry: _Entry, now: float) -> Optional[float]:
+        if entry.blocked_until > now:
+            return entry.blocked_until - now
+        if entry.tokens < 1:
+            return (1 - entry.tokens) * self.refill_seconds
+        return None
+
+    def retry_after(self, key: str) -> Optional[float]:
+        """Como acquire pero sin consumir: None si ahora se permitiría un intento"""
+        now = time.monotonic()
+        with self._lock:
+            return self._wait(self._entry(key, now), now)
+
+    def acquire(self, key: str) -> Optional[float]:
+        """Consumir un intento; si no se permite, segundos que hay que esperar"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entry(key, now)
+            wait = self._wait(entry, now)
+            if wait is None:
+                entry.tokens -= 1
+            return wait
+
+    def failure(self, key: str) -> None:
+        """Registrar un fallo (activa el backoff a partir de `backoff_after` fallos seguidos)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entry(key, now)
+            entry.failures += 1
+            excess = entry.failures - self.backoff_after
+            if excess >= 0:
+                delay = min(LOGIN_BACKOFF_BASE_SECONDS * 2 ** min(excess, 32), LOGIN_BACKOFF_MAX_SECONDS)
+                entry.blocked_until = now + delay
+
+    def success(self, key: str) -> None:
+        """Un login correcto reinicia la racha de fallos de la clave"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.failures = 0
+                entry.blocked_until = 0.0
+
+class LoginThrottle:
+    """Limitadores por usuario y por IP con sus métricas"""
+
+    def __init__(self):
+        self.by_username = LoginLimiter(
+            "username", LOGIN_USER_CAPACITY, LOGIN_USER_REFILL_SECONDS, LOGIN_USER_BACKOFF_AFTER
+        )
+        self.by_ip = LoginLimiter("ip", LOGIN_IP_CAPACITY, LOGIN_IP_REFILL_SECONDS, LOGIN_IP_BACKOFF_AFTER)
+        self.attempts = registry.counter("login_attempts_total", "Login attempts by result", label="result")
+        self.throttled = registry.counter("login_throttled_total", "Login attempts rejected before hashing", label="scope")
+
+    @staticmethod
+    def _username_key(username: str) -> str:
+        return username.strip().lower()
+
+    def _limiters(self, username: str, ip: Optional[str]) -> list:
+        """(limitador, clave) que aplican; sin IP conocida sólo el del usuario"""
+        limiters = [(self.by_username, self._username_key(username))]
+        if ip is not None:
+            limiters.insert(0, (self.by_ip, ip))
+        return limiters
+
+    def check(self, username: str, ip: Optional[str]) -> Optional[float]:
+        """None si se puede intentar el login; si no, segundos para Retry-After
+
+        Se comprueban todos los limitadores antes de consumir de ninguno: un intento
+        rechazado por el usuario no gasta el cupo de la IP (ni al revés).
+        """
+        limiters = self._limiters(username, ip)
+        for limiter, key in limiters:
+            retry_after = limiter.retry_after(key)
+            if retry_after is not None:
+                self.throttled.inc(label_value=limiter.scope)
+                self.attempts.inc(label_value="throttled")
+                return retry_after
+        for limiter, key in limiters:
+            limiter.acquire(key)
+        return None
+
+    def failure(self, username: str, ip: Optional[str]) -> None:
+        self.attempts.inc(label_value="failure")
+        for limiter, key in self._limiters(username, ip):
+            limiter.failure(key)
+
+    def success(self, username: str, ip: Optional[str]) -> None:
+        self.attempts.inc(label_value="success")
+        for limiter, key in self._limiters(username, ip):
+            limiter.success(key)
+
+login_throttle = LoginThrottle()